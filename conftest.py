@@ -0,0 +1,9 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """ The test database is rolled back after every test, so nothing cached should outlive the test either """
+    yield
+    cache.clear()
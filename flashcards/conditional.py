@@ -0,0 +1,79 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Callable, Optional, Sequence, Tuple
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from flashcards.notes.caching import notes_version
+
+"""
+Conditional GET for the pages of a user. A page is validated with an ETag made from the versions of what it shows,
+and with a Last-Modified header when there is a single timestamp to use. Browsers are told to revalidate pages
+every time, so unchanged pages cost a 304 instead of a full render
+"""
+
+# What a view shows: something to hash, and its last modification time if there is one to use
+PageVersion = Tuple[Sequence, Optional[datetime]]
+
+
+def conditional_page(version: Callable[..., Optional[PageVersion]]):
+    """
+    Decorator for the `get` method of a view, sync or async
+
+    Args:
+        version: Called once per request with the arguments of the view. Returns the version of what the page
+            shows, or None if it can't be validated, in which case the page is rendered as usual. It must be a
+            lightweight query, and it shouldn't raise if the resource doesn't exist
+    """
+    def page_version(request, *args, **kwargs) -> Optional[PageVersion]:
+        if not hasattr(request, '_page_version'):
+            # Pending messages are shown by the page, the cached one doesn't have them
+            has_messages = len(messages.get_messages(request)) > 0
+            request._page_version = None if has_messages else version(request, *args, **kwargs)
+        return request._page_version
+
+    def validators(request, *args, **kwargs) -> Tuple[Optional[str], Optional[datetime]]:
+        if (current := page_version(request, *args, **kwargs)) is None:
+            return None, None
+        # Every page also shows the user, the sidebar of notes and a CSRF token
+        parts = (request.user.pk, notes_version(request.user.pk), request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+                 *current[0])
+        return quote_etag(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()), current[1]
+
+    def not_modified(request, etag: Optional[str], last_modified: Optional[datetime]):
+        timestamp = None if last_modified is None else int(last_modified.timestamp())
+        return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def add_validators(response, etag: Optional[str], last_modified: Optional[datetime]):
+        if last_modified is not None and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+        if etag is not None:
+            response.headers.setdefault('ETag', etag)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def decorator(get):
+        if iscoroutinefunction(get):
+            @wraps(get)
+            async def async_wrapper(self, request, *args, **kwargs):
+                # The version is found with the ORM, which can't be used from the event loop
+                etag, last_modified = await sync_to_async(validators)(request, *args, **kwargs)
+                if (response := not_modified(request, etag, last_modified)) is None:
+                    response = await get(self, request, *args, **kwargs)
+                return add_validators(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = validators(request, *args, **kwargs)
+            if (response := not_modified(request, etag, last_modified)) is None:
+                response = get(self, request, *args, **kwargs)
+            return add_validators(response, etag, last_modified)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,123 @@
+import os
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+
+"""
+Postgres backend with a pool of connections per process, shared by its threads.
+
+Django keeps a connection per thread. Under threaded or async workers, where every request can run in a new thread,
+persistent connections are never reused, so every request pays for a new connection. With this backend, closing a
+connection at the end of a request hands it back to the pool instead, for the next thread to use. Use it with
+CONN_MAX_AGE=0, settings:
+
+    'ENGINE': 'flashcards.db.postgresql_pool',
+    'POOL': {'SIZE': 10, 'TIMEOUT': 10},
+"""
+
+if base.is_psycopg3:
+    raise ImproperlyConfigured('flashcards.db.postgresql_pool only supports psycopg2')
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN  # noqa: E402
+
+
+class ConnectionPool:
+    """
+    Up to `size` connections of a database, taking them blocks up to `timeout` seconds when every one is in use
+
+    Args:
+        size: Most connections open at the same time
+        timeout: Seconds to wait for a connection before giving up
+        health_checks: Whether idle connections are checked before handing them out
+    """
+
+    def __init__(self, size: int, timeout: float, health_checks: bool):
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # Last in, first out, the connection handed out is the one most likely to still be open
+        self._idle: List = []
+
+    def get(self, connect: Callable):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise base.Database.OperationalError(f'No database connection was free after {self.timeout} seconds')
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return connect()
+                if self._usable(connection):
+                    return connection
+                connection.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, connection, discard: bool = False) -> None:
+        """ Hands a connection back, or closes it if `discard` or if it's broken """
+        try:
+            status = connection.info.transaction_status if not connection.closed else TRANSACTION_STATUS_UNKNOWN
+            if discard or status == TRANSACTION_STATUS_UNKNOWN:
+                connection.close()
+                return
+            if status != TRANSACTION_STATUS_IDLE:
+                # Closed in the middle of a transaction, e.g. by an error. connection.rollback() does nothing in
+                # autocommit mode, even if a transaction was started with BEGIN
+                with connection.cursor() as cursor:
+                    cursor.execute('ROLLBACK')
+            with self._lock:
+                self._idle.append(connection)
+        except base.Database.Error:
+            connection.close()
+        finally:
+            self._slots.release()
+
+    def clear(self) -> None:
+        """ Closes the idle connections """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _usable(self, connection) -> bool:
+        if connection.closed:
+            return False
+        if not self.health_checks:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except base.Database.Error:
+            return False
+
+
+_pools: Dict[Tuple[str, int], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self) -> ConnectionPool:
+        # Forked workers can't share the sockets of their parent, each process has its own pools
+        key = (self.alias, os.getpid())
+        with _pools_lock:
+            if key not in _pools:
+                options = self.settings_dict.get('POOL', {})
+                _pools[key] = ConnectionPool(options.get('SIZE', 10), options.get('TIMEOUT', 10),
+                                             self.settings_dict.get('CONN_HEALTH_CHECKS', False))
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        return self.pool.get(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # Inside an atomic block the wrapper holds on to the connection until the block ends
+                self.pool.put(self.connection, discard=self.in_atomic_block)
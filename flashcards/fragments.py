@@ -0,0 +1,39 @@
+from functools import cached_property
+from typing import Any, Callable, Iterator, List, Tuple
+
+"""
+Pages are cached in fragments with {% cache %}, keyed on the version of what they show. The version has to be read
+before the data, so a fragment is never stored under a version newer than its data. What a fragment shows is loaded
+lazily, when the template renders it, so a cached fragment costs a cache lookup and no queries. Fragments are kept
+for a day, a new version makes new keys so the timeout only bounds the space used by the old ones
+"""
+
+
+class LazyPage:
+    """
+    Page of a list and the cursor of the next one, loaded the first time either is used
+
+    Args:
+        load: Gets the items of the page and the cursor of the next one
+    """
+
+    def __init__(self, load: Callable[[], Tuple[List, Any]]):
+        self._load = load
+
+    @cached_property
+    def _page(self) -> Tuple[List, Any]:
+        return self._load()
+
+    @property
+    def items(self) -> List:
+        return self._page[0]
+
+    @property
+    def next_after(self) -> Any:
+        return self._page[1]
+
+    def __iter__(self) -> Iterator:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class LeitnerConfig(AppConfig):
     name = 'flashcards.leitner'
+
+    def ready(self):
+        from flashcards.leitner import signals  # noqa: F401
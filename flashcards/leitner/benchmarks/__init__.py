@@ -0,0 +1,7 @@
+"""
+Microbenchmarks for the Leitner models and the study session flow. Run them with
+
+    python -m flashcards.leitner.benchmarks --output bench.json
+
+They run on a test database created from DATABASE_URL (SQLite or Postgres), which is destroyed afterwards
+"""
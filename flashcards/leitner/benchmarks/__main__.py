@@ -0,0 +1,75 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import django
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline: dict) -> None:
+    for name, summary in results['results'].items():
+        if name in baseline['results']:
+            before, after = baseline['results'][name]['median_ms'], summary['median_ms']
+            print(f'{name:>24}: {before:9.3f} ms -> {after:9.3f} ms ({after / before:6.2f}x)')
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m flashcards.leitner.benchmarks', description=__doc__)
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--decks', type=int, default=5)
+    parser.add_argument('--cards', type=int, default=2000, help='Cards per deck')
+    parser.add_argument('--runs', type=int, default=200, help='Times each benchmark is run')
+    parser.add_argument('--output', default='bench.json', help='Where the JSON results are written')
+    parser.add_argument('--compare', help='Results of a previous run to compare against')
+    args = parser.parse_args()
+    if args.cards < args.runs:
+        parser.error('--cards must be at least --runs')
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flashcards.settings')
+    django.setup()
+    # The request timings would be logged for every request of the session loop
+    logging.getLogger('flashcards.timing').setLevel(logging.WARNING)
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from flashcards.leitner.benchmarks.suite import run_suite
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        results = run_suite(args.users, args.decks, args.cards, args.runs)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    output = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'params': {'users': args.users, 'decks': args.decks, 'cards': args.cards, 'runs': args.runs},
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=2)
+    print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as file:
+            compare(output, json.load(file))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
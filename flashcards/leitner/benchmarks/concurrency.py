@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Dict, List
+
+import django
+
+"""
+Compares how many concurrent study sessions a single worker holds when served over WSGI and over ASGI.
+
+Every simulated student has a study session in progress and loads its current card again and again, sending the
+next request as soon as the previous one is answered. Under WSGI the worker is a pool of threads, like a gunicorn
+`gthread` worker, so students wait for a free thread. Under ASGI the worker is one event loop running the async
+views. A mode holds a level of concurrency when the p99 latency stays within the budget.
+
+The requests don't go through a network, but the database does: run it with the `DATABASE_URL` of the database
+used in production to compare the modes, SQLite has no round trips to wait for.
+
+    python -m flashcards.leitner.benchmarks.concurrency --students 1 10 50 100 --threads 4
+"""
+
+
+def wsgi_get(handler, path: str, cookie: str) -> int:
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+        'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    }
+    status = []
+    body = handler(environ, lambda status_line, headers: status.append(int(status_line.split()[0])))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return status[0]
+
+
+async def asgi_get(application, path: str, cookie: str) -> int:
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def run_wsgi(paths: List[str], cookie: str, requests: int, threads: int) -> List[float]:
+    """ Every student is a client thread, sending its requests to a worker of `threads` threads """
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    latencies = []
+    lock = threading.Lock()
+
+    def student(pool: ThreadPoolExecutor, path: str):
+        for _ in range(requests):
+            start = perf_counter()
+            if (status := pool.submit(wsgi_get, handler, path, cookie).result()) != 200:
+                raise RuntimeError(f'GET {path} answered {status}')
+            with lock:
+                latencies.append(perf_counter() - start)
+
+    with ThreadPoolExecutor(threads) as pool:
+        clients = [threading.Thread(target=student, args=(pool, path)) for path in paths]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    return latencies
+
+
+def run_asgi(paths: List[str], cookie: str, requests: int) -> List[float]:
+    """ Every student is a task of the event loop of the worker """
+    from django.core.handlers.asgi import ASGIHandler
+
+    application = ASGIHandler()
+    latencies = []
+
+    async def student(path: str):
+        for _ in range(requests):
+            start = perf_counter()
+            if (status := await asgi_get(application, path, cookie)) != 200:
+                raise RuntimeError(f'GET {path} answered {status}')
+            latencies.append(perf_counter() - start)
+
+    async def students():
+        await asyncio.gather(*(student(path) for path in paths))
+
+    asyncio.run(students())
+    return latencies
+
+
+def summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def run_comparison(levels: List[int], requests: int, threads: int, budget_ms: float) -> Dict[str, dict]:
+    """
+    Seeds a deck with a study session in progress per student and runs every level of concurrency in both modes
+
+    Args:
+        levels: Amounts of students studying at the same time
+        requests: Requests sent by every student
+        threads: Threads of the WSGI worker
+        budget_ms: p99 latency under which a mode holds a level
+
+    Returns:
+        dict: Summary of every level of each mode, and the highest level each mode holds
+    """
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import reverse
+
+    from flashcards.leitner.benchmarks.seeding import seed
+    from flashcards.leitner.models import Session
+
+    decks = seed(users=1, decks=max(levels), cards=1)
+    for deck in decks:
+        Session.start(deck, deck.boxes.get(box_type=0))
+    client = Client()
+    client.force_login(decks[0].created_by)
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    paths = [reverse('leitner:session-cards', args=(deck.pk,)) for deck in decks]
+
+    results = {'wsgi': {}, 'asgi': {}}
+    for level in levels:
+        for mode, run in (('wsgi', lambda: run_wsgi(paths[:level], cookie, requests, threads)),
+                          ('asgi', lambda: run_asgi(paths[:level], cookie, requests))):
+            start = perf_counter()
+            latencies = run()
+            results[mode][level] = summary(latencies, perf_counter() - start)
+    return {
+        'levels': results,
+        'holds': {mode: max((level for level, result in levels_.items() if result['p99_ms'] <= budget_ms),
+                            default=0)
+                  for mode, levels_ in results.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m flashcards.leitner.benchmarks.concurrency')
+    parser.add_argument('--students', type=int, nargs='+', default=[1, 10, 50, 100],
+                        help='Levels of concurrency to run')
+    parser.add_argument('--requests', type=int, default=20, help='Requests sent by every student')
+    parser.add_argument('--threads', type=int, default=4, help='Threads of the WSGI worker')
+    parser.add_argument('--budget-ms', type=float, default=500, help='p99 latency to hold a level')
+    parser.add_argument('--output', default='concurrency.json', help='Where the JSON results are written')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flashcards.settings')
+    django.setup()
+    logging.getLogger('flashcards.timing').setLevel(logging.WARNING)
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    # The handlers use a connection per thread, they have to see the same database
+    old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+    try:
+        results = run_comparison(args.students, args.requests, args.threads, args.budget_ms)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    output = {
+        'meta': {'database': connection.vendor, 'django': django.get_version(),
+                 'params': {'requests': args.requests, 'threads': args.threads, 'budget_ms': args.budget_ms}},
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=2)
+    print(f'{"students":>8} {"mode":>5} {"req/s":>9} {"p50 ms":>9} {"p99 ms":>9}')
+    for level in args.students:
+        for mode in ('wsgi', 'asgi'):
+            result = results['levels'][mode][level]
+            print(f'{level:>8} {mode:>5} {result["requests_per_second"]:9.1f} {result["p50_ms"]:9.1f} '
+                  f'{result["p99_ms"]:9.1f}')
+    print(f'Sessions held with p99 <= {args.budget_ms:g} ms: '
+          + ', '.join(f'{mode} {held}' for mode, held in results['holds'].items()))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
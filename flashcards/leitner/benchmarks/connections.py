@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import weakref
+from time import perf_counter
+from typing import Callable, Dict
+
+import django
+
+"""
+Per-request cost of the database connection settings: a new connection per request (CONN_MAX_AGE=0), persistent
+connections, and the connection pool of flashcards.db.postgresql_pool, which only runs on Postgres.
+
+Each mode runs the same requests of the deck list through the WSGI handler, where requests reuse the thread of
+the worker, and through the ASGI handler, where every request runs its queries in a new thread. Run it with the
+`DATABASE_URL` of a Postgres server to see the cost of connecting, on SQLite connecting is cheap.
+
+    python -m flashcards.leitner.benchmarks.connections --requests 200
+"""
+
+
+def run_requests(server: str, path: str, cookie: str, requests: int) -> Dict[str, float]:
+    from django.core.handlers.asgi import ASGIHandler
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db.backends.signals import connection_created
+
+    from flashcards.leitner.benchmarks.concurrency import asgi_get, wsgi_get
+
+    if server == 'wsgi':
+        handler = WSGIHandler()
+        get: Callable[[], int] = lambda: wsgi_get(handler, path, cookie)  # noqa: E731
+    else:
+        application = ASGIHandler()
+        get = lambda: asyncio.run(asgi_get(application, path, cookie))  # noqa: E731
+    # The pool hands out connections it opened before, only new ones count. Holding on to them would keep the
+    # connections of finished threads open
+    seen = weakref.WeakSet()
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        try:
+            if connection.connection in seen:
+                return
+            seen.add(connection.connection)
+        except TypeError:
+            # SQLite connections can't be weakly referenced, they aren't pooled either
+            pass
+        opened.append(connection.alias)
+
+    connection_created.connect(count)
+    try:
+        durations = []
+        for _ in range(requests):
+            start = perf_counter()
+            if (status := get()) != 200:
+                raise RuntimeError(f'GET {path} answered {status}')
+            durations.append(perf_counter() - start)
+    finally:
+        connection_created.disconnect(count)
+    return {
+        'requests': requests,
+        'median_ms': statistics.median(durations) * 1000,
+        'mean_ms': statistics.mean(durations) * 1000,
+        'connections_opened': len(opened),
+    }
+
+
+def run_comparison(requests: int) -> Dict[str, Dict[str, dict]]:
+    """
+    Runs `requests` requests with every connection mode under both handlers
+
+    Returns:
+        dict: Summary of the requests of every mode and handler
+    """
+    from django.conf import settings
+    from django.db import connection, connections
+    from django.test import Client
+    from django.urls import reverse
+
+    from flashcards.users.models import User
+
+    user = User.objects.create_user('connections', 'connections@example.com', 'connections')
+    client = Client()
+    client.force_login(user)
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    path = reverse('leitner:deck-list')
+
+    modes = {'per_request': {'CONN_MAX_AGE': 0}, 'persistent': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}}
+    if connection.vendor == 'postgresql':
+        modes['pooled'] = {'ENGINE': 'flashcards.db.postgresql_pool', 'CONN_MAX_AGE': 0,
+                           'POOL': {'SIZE': 4, 'TIMEOUT': 10}}
+    original = connection.settings_dict
+    connection.close()
+    results = {}
+    for mode, overrides in modes.items():
+        results[mode] = {}
+        for server in ('wsgi', 'asgi'):
+            # Connections are created from the settings of the alias, for the main thread and the new ones alike
+            connections.settings['default'] = {**original, **overrides}
+            del connections['default']
+            results[mode][server] = run_requests(server, path, cookie, requests)
+            connections['default'].close()
+            # Persistent connections of finished ASGI threads are only closed once their wrapper is collected
+            gc.collect()
+            if mode == 'pooled':
+                connections['default'].pool.clear()
+    connections.settings['default'] = original
+    del connections['default']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m flashcards.leitner.benchmarks.connections')
+    parser.add_argument('--requests', type=int, default=200, help='Requests of each mode and handler')
+    parser.add_argument('--output', default='connections.json', help='Where the JSON results are written')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flashcards.settings')
+    django.setup()
+    logging.getLogger('flashcards.timing').setLevel(logging.WARNING)
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            # An in-memory database is never closed, connecting again has to open a file
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'connections.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            results = run_comparison(args.requests)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    output = {
+        'meta': {'database': connection.vendor, 'django': django.get_version(), 'params': {'requests': args.requests}},
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=2)
+    print(f'{"mode":>12} {"server":>6} {"median ms":>10} {"mean ms":>9} {"connections":>12}')
+    for mode, servers in results.items():
+        for server, result in servers.items():
+            print(f'{mode:>12} {server:>6} {result["median_ms"]:10.2f} {result["mean_ms"]:9.2f} '
+                  f'{result["connections_opened"]:>12}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
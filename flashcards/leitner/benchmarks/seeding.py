@@ -0,0 +1,28 @@
+from typing import List
+
+from flashcards.leitner.models import Box, Card, Deck
+from flashcards.users.models import User
+
+
+def seed(users: int, decks: int, cards: int) -> List[Deck]:
+    """
+    Creates `users` users with `decks` decks each, every deck with its boxes and `cards` cards on the first box
+
+    Returns:
+        list: Every created deck
+    """
+    created_decks = []
+    for user_num in range(users):
+        user = User.objects.create_user(f'benchmark{user_num}', f'benchmark{user_num}@example.com', 'benchmark')
+        for deck_num in range(decks):
+            deck = Deck.objects.create(description=f'Deck {deck_num}', created_by=user)
+            deck.create_boxes()
+            first_box = deck.boxes.get(box_type=0)
+            Card.objects.bulk_create(
+                (Card(front_text=f'Card {card_num}', back_text=f'Back of card {card_num}', on_deck=deck,
+                      on_box=first_box) for card_num in range(cards)),
+                batch_size=1000,
+            )
+            Box.update_card_counts({first_box.pk: cards})
+            created_decks.append(deck)
+    return created_decks
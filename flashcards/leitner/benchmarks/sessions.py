@@ -0,0 +1,118 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Dict
+
+import django
+
+"""
+Database queries of the sessions and flash messages per study answer, with every session backend and message
+storage (see SESSION_BACKEND and MESSAGE_BACKEND in the settings).
+
+An answer is what a student does for every card: loading it and posting the answer, which redirects with a flash
+message shown on the next card. Queries of the django_session table are counted apart from the rest.
+
+    python -m flashcards.leitner.benchmarks.sessions --answers 50
+"""
+
+SESSION_BACKENDS = ('db', 'cached_db', 'signed_cookies')
+MESSAGE_STORAGES = {
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+}
+
+
+def count_answers(deck, answers: int) -> Dict[str, float]:
+    """ Answers `answers` cards of a new session of the deck, with the session and message settings in use """
+    from django.core.cache import cache
+    from django.db import connection, transaction
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from flashcards.leitner.models import Session
+
+    cache.clear()
+    with transaction.atomic():
+        Session.start(deck, deck.boxes.get(box_type=0))
+        client = Client()
+        client.force_login(deck.created_by)
+        url = reverse('leitner:session-cards', args=(deck.pk,))
+        # The first answer loads the session into the cache and creates the daily statistics
+        client.get(url)
+        client.post(url, {'_correct': 'Yes'})
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(answers):
+                client.get(url)
+                client.post(url, {'_correct': 'Yes'})
+        transaction.set_rollback(True)
+
+    statements = [query['sql'] for query in queries.captured_queries if not query['sql'].startswith('SAVEPOINT')
+                  and not query['sql'].startswith('RELEASE SAVEPOINT')]
+    sessions = [sql for sql in statements if 'django_session' in sql]
+    return {
+        'session_reads': sum(sql.startswith('SELECT') for sql in sessions) / answers,
+        'session_writes': sum(not sql.startswith('SELECT') for sql in sessions) / answers,
+        'queries': len(statements) / answers,
+    }
+
+
+def run_comparison(answers: int) -> Dict[str, Dict[str, float]]:
+    """
+    Counts the queries per answer of every session backend and message storage
+
+    Returns:
+        dict: Queries per answer, by `<session backend>/<message storage>`
+    """
+    from django.test import override_settings
+
+    from flashcards.leitner.benchmarks.seeding import seed
+
+    deck = seed(users=1, decks=1, cards=answers + 1)[0]
+    results = {}
+    for backend in SESSION_BACKENDS:
+        for storage, storage_class in MESSAGE_STORAGES.items():
+            with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{backend}',
+                                   MESSAGE_STORAGE=storage_class):
+                results[f'{backend}/{storage}'] = count_answers(deck, answers)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m flashcards.leitner.benchmarks.sessions')
+    parser.add_argument('--answers', type=int, default=50, help='Cards answered with each configuration')
+    parser.add_argument('--output', default='sessions.json', help='Where the JSON results are written')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flashcards.settings')
+    django.setup()
+    logging.getLogger('flashcards.timing').setLevel(logging.WARNING)
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        results = run_comparison(args.answers)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    output = {
+        'meta': {'database': connection.vendor, 'django': django.get_version(), 'params': {'answers': args.answers}},
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=2)
+    baseline = results['db/session']
+    print(f'{"sessions/messages":>24} {"reads":>6} {"writes":>7} {"queries":>8} {"writes saved":>13}')
+    for name, result in results.items():
+        print(f'{name:>24} {result["session_reads"]:6.2f} {result["session_writes"]:7.2f} {result["queries"]:8.2f} '
+              f'{baseline["session_writes"] - result["session_writes"]:13.2f}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
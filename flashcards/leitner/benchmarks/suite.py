@@ -0,0 +1,122 @@
+import statistics
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List
+
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from flashcards.leitner.benchmarks.seeding import seed
+from flashcards.leitner.models import Deck, Session
+from flashcards.search.backends import search
+
+"""
+Every benchmark is a generator that prepares what it needs and yields a function to time, once per run.
+They run inside a transaction that is rolled back, so they don't change the seeded data for the next one
+"""
+
+
+def bench_current_card(deck: Deck, runs: int) -> Iterator[Callable]:
+    session = Session.start(deck, deck.boxes.get(box_type=0))
+    for _ in range(runs):
+        yield session.current_card
+
+
+def bench_correct_answer(deck: Deck, runs: int) -> Iterator[Callable]:
+    session = Session.start(deck, deck.boxes.get(box_type=0))
+    for _ in range(runs):
+        card = session.current_card()
+        yield lambda: card.correct_answer(session)
+
+
+def bench_wrong_answer(deck: Deck, runs: int) -> Iterator[Callable]:
+    session = Session.start(deck, deck.boxes.get(box_type=0))
+    for _ in range(runs):
+        card = session.current_card()
+        yield lambda: card.wrong_answer(session)
+
+
+def bench_create_boxes(deck: Deck, runs: int) -> Iterator[Callable]:
+    for _ in range(runs):
+        yield Deck.objects.create(description='Benchmark deck', created_by=deck.created_by).create_boxes
+
+
+def bench_session_loop(deck: Deck, runs: int) -> Iterator[Callable]:
+    """ Times a full study session answering `runs` cards through the views, as a user would """
+    client = Client()
+    client.force_login(deck.created_by)
+    cards_url = reverse('leitner:session-cards', args=(deck.pk,))
+    finished_url = reverse('leitner:session-finished', args=(deck.pk,))
+
+    def study():
+        client.post(reverse('leitner:session', args=(deck.pk,)), {'current_box': deck.boxes.get(box_type=0).pk})
+        for _ in range(runs):
+            client.get(cards_url)
+            client.post(cards_url, {'_correct': 'Yes'})
+        Session.objects.filter(deck=deck).update(is_finished=True)
+        client.post(finished_url)
+
+    yield study
+
+
+def bench_deck_page(deck: Deck, runs: int) -> Iterator[Callable]:
+    """ Loads the page of the deck, its boxes are rendered by the first run and read from the cache by the rest """
+    client = Client()
+    client.force_login(deck.created_by)
+    url = reverse('leitner:deck-detail', args=(deck.pk,))
+    for _ in range(runs):
+        yield lambda: client.get(url)
+
+
+def bench_search(deck: Deck, runs: int) -> Iterator[Callable]:
+    """ Ranked search over every card of the user, matching a prefix """
+    for _ in range(runs):
+        yield lambda: search(deck.created_by, 'back card 1')
+
+
+BENCHMARKS = {
+    'session_current_card': bench_current_card,
+    'card_correct_answer': bench_correct_answer,
+    'card_wrong_answer': bench_wrong_answer,
+    'deck_create_boxes': bench_create_boxes,
+    'session_loop': bench_session_loop,
+    'deck_page': bench_deck_page,
+    'search': bench_search,
+}
+
+
+def summary(durations: List[float]) -> Dict[str, float]:
+    return {
+        'runs': len(durations),
+        'min_ms': min(durations) * 1000,
+        'median_ms': statistics.median(durations) * 1000,
+        'mean_ms': statistics.mean(durations) * 1000,
+        'max_ms': max(durations) * 1000,
+    }
+
+
+def run_suite(users: int, decks: int, cards: int, runs: int) -> Dict[str, Dict[str, float]]:
+    """
+    Seeds the database and runs every benchmark on the last seeded deck
+
+    Args:
+        users: Amount of users to seed
+        decks: Amount of decks per user
+        cards: Amount of cards per deck. Must be at least `runs`
+        runs: Times each benchmark is run. The session loop answers this amount of cards once
+
+    Returns:
+        dict: Summary of the durations of each benchmark
+    """
+    deck = seed(users, decks, cards)[-1]
+    results = {}
+    for name, benchmark in BENCHMARKS.items():
+        durations = []
+        with transaction.atomic():
+            for func in benchmark(deck, runs):
+                start = perf_counter()
+                func()
+                durations.append(perf_counter() - start)
+            transaction.set_rollback(True)
+        results[name] = summary(durations)
+    return results
@@ -0,0 +1,91 @@
+import hashlib
+import uuid
+from typing import List, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+# Imported as a module, flashcards.leitner.models uses this one too
+from flashcards.leitner import models
+
+"""
+Cached summaries for the deck pages. They are invalidated by the signals in flashcards.leitner.signals, and
+explicitly by the bulk operations that skip them (bulk_create, bulk_update and QuerySet.update).
+
+Each deck also has a version, a token read from the database that changes with the deck, its boxes and the last
+change of their cards. Deck pages use it as their ETag and as the key of their cached fragments, like the deck list
+uses the version of the list
+"""
+
+
+def _deck_list_key(user_id: int) -> str:
+    return f'leitner:decks:{user_id}'
+
+
+def _deck_list_version_key(user_id: int) -> str:
+    return f'leitner:decks-version:{user_id}'
+
+
+def _box_summaries_key(deck_id: int) -> str:
+    return f'leitner:boxes:{deck_id}'
+
+
+def deck_list(user_id: int) -> List[dict]:
+    """ Gets the id and description of every deck of the user """
+    decks = cache.get(_deck_list_key(user_id))
+    if decks is None:
+        decks = list(models.Deck.objects.filter(created_by=user_id).order_by('pk').values('pk', 'description'))
+        cache.set(_deck_list_key(user_id), decks)
+    return decks
+
+
+def box_summaries(deck_id: int) -> List['models.Box']:
+    """ Gets the boxes of the deck ordered by type """
+    boxes = cache.get(_box_summaries_key(deck_id))
+    if boxes is None:
+        boxes = list(models.Box.objects.filter(deck=deck_id).order_by('box_type'))
+        cache.set(_box_summaries_key(deck_id), boxes)
+    return boxes
+
+
+def deck_list_version(user_id: int) -> str:
+    """ Gets the version of the deck list of the user, a new one is made if it isn't cached """
+    return cache.get_or_set(_deck_list_version_key(user_id), lambda: uuid.uuid4().hex)
+
+
+def deck_version(deck_id: int, user_id: Optional[int] = None) -> Optional[str]:
+    """
+    Gets the version of the deck from the database, in a single query. Boxes are a few rows and the last change of
+    their cards is found on the (on_box, updated_at) index, so it costs the same whatever the size of the deck
+
+    Args:
+        deck_id: Deck to get the version of
+        user_id: Owner of the deck, if given the deck must be theirs
+
+    Returns:
+        str or None: Version of the deck, None if it doesn't exist
+    """
+    last_change = models.Card.objects.filter(on_box=OuterRef('boxes')).order_by('-updated_at').values('updated_at')
+    decks = models.Deck.objects.filter(pk=deck_id)
+    if user_id is not None:
+        decks = decks.filter(created_by=user_id)
+    rows = list(decks.annotate(last_change=Subquery(last_change[:1])).order_by('boxes__box_type').values_list(
+        'description', 'card_scheduling', 'boxes', 'boxes__card_count', 'boxes__last_used', 'boxes__in_session',
+        'last_change'))
+    return hashlib.md5(repr(rows).encode()).hexdigest() if rows else None
+
+
+def _delete_now_and_on_commit(key: str) -> None:
+    # Deleting again after the commit avoids caching data another request read before the transaction finished
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def invalidate_deck_list(user_id: int) -> None:
+    _delete_now_and_on_commit(_deck_list_key(user_id))
+    _delete_now_and_on_commit(_deck_list_version_key(user_id))
+
+
+def invalidate_box_summaries(deck_id: int) -> None:
+    _delete_now_and_on_commit(_box_summaries_key(deck_id))
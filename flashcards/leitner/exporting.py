@@ -0,0 +1,71 @@
+import csv
+import json
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from flashcards.leitner.models import Card, Deck
+
+"""
+Streamed exports of decks and cards. Rows are read from the database in chunks, so exports use constant memory
+no matter how many cards there are, under WSGI and ASGI alike
+"""
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """ File-like object that returns what is written, so csv.writer can build rows one at a time """
+
+    def write(self, value):
+        return value
+
+
+def deck_csv_lines(deck: Deck) -> Iterator[str]:
+    """ Lines of a CSV file with the front text, back text and box type of every card, the format used to import """
+    writer = csv.writer(Echo())
+    yield writer.writerow(['front', 'back', 'box_type'])
+    cards = Card.objects.filter(on_deck=deck).order_by('pk').values_list(
+        'front_text', 'back_text', 'on_box__box_type')
+    for row in cards.iterator(chunk_size=CHUNK_SIZE):
+        yield writer.writerow(row)
+
+
+def account_json_lines(user) -> Iterator[str]:
+    """ JSON lines with every deck of the user followed by their cards """
+    decks = Deck.objects.filter(created_by=user).order_by('pk').values_list('pk', 'description')
+    for pk, description in decks.iterator(chunk_size=CHUNK_SIZE):
+        yield json_line({'type': 'deck', 'id': pk, 'description': description})
+
+    cards = Card.objects.filter(on_deck__created_by=user).order_by('on_deck', 'pk').values_list(
+        'on_deck', 'on_box__box_type', 'front_text', 'back_text', 'updated_at')
+    for deck, box_type, front_text, back_text, updated_at in cards.iterator(chunk_size=CHUNK_SIZE):
+        yield json_line({'type': 'card', 'deck': deck, 'box_type': box_type, 'front_text': front_text,
+                         'back_text': back_text, 'updated_at': updated_at})
+
+
+def json_line(obj: dict) -> str:
+    return json.dumps(obj, cls=DjangoJSONEncoder) + '\n'
+
+
+def streaming_response(request, lines: Iterator[str], content_type: str, filename: str) -> StreamingHttpResponse:
+    """
+    Streams the lines as a file to download. Under ASGI, Django reads a sync iterator whole before sending it, so
+    the lines are sent from an async iterator instead
+    """
+    if isinstance(request, ASGIRequest):
+        lines = chunks(lines)
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+async def chunks(lines: Iterator[str]) -> AsyncIterator[str]:
+    """ Joins every CHUNK_SIZE lines, reading them in the thread that has the database connection """
+    read = sync_to_async(lambda: ''.join(islice(lines, CHUNK_SIZE)))
+    while chunk := await read():
+        yield chunk
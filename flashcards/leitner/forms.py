@@ -50,3 +50,8 @@ class SessionSelectBoxForm(forms.Form):
     def __init__(self, deck, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['current_box'].queryset = Box.objects.filter(deck=deck).order_by('box_type')
+
+
+class CardImportForm(forms.Form):
+    file = forms.FileField(label='CSV or TSV file', help_text='Columns: front text, back text and optionally the box '
+                                                              'type (0, 1 or 2). Uses the first box by default')
@@ -0,0 +1,107 @@
+import csv
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from django.db import transaction
+
+from flashcards.leitner import caching
+from flashcards.leitner.models import Box, BoxLadder, Card, Deck
+
+"""
+Bulk import of cards from CSV/TSV files. Every row has the front text, the back text and optionally the box type
+where the card goes (the first box by default)
+"""
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+
+
+class RowError(NamedTuple):
+    line: int
+    message: str
+
+
+class CardImportError(Exception):
+    def __init__(self, errors: List[RowError], total_errors: int):
+        super().__init__(f'{total_errors} rows could not be imported')
+        self.errors = errors
+        self.total_errors = total_errors
+
+
+def delimiter_for(filename: str) -> str:
+    return '\t' if filename.lower().endswith('.tsv') else ','
+
+
+def import_cards(deck: Deck, lines: Iterable[str], delimiter: str = ',', chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Imports the cards in a single transaction, reading the lines as they come and inserting them in chunks
+
+    Args:
+        deck: Deck where the cards are created
+        lines: Lines of the file, e.g. a file opened in text mode with newline=''
+        delimiter: Column delimiter
+        chunk_size: Amount of cards per INSERT
+
+    Returns:
+        int: Amount of cards imported
+
+    Raises:
+        CardImportError: If any row is invalid. Nothing is imported in that case
+    """
+    box_ids = BoxLadder.for_deck(deck.pk).box_ids
+    errors = []
+    total_errors = 0
+    imported = 0
+    imported_by_box = Counter()
+    chunk = []
+    reader = csv.reader(lines, delimiter=delimiter)
+
+    with transaction.atomic():
+        try:
+            for row in reader:
+                try:
+                    card = _card_from_row(row, deck, box_ids, is_first_row=reader.line_num == 1)
+                except ValueError as e:
+                    total_errors += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(RowError(reader.line_num, str(e)))
+                    continue
+                if card is None or total_errors:
+                    # Blank lines and headers are skipped, and nothing else is inserted once a row failed
+                    continue
+                chunk.append(card)
+                imported += 1
+                imported_by_box[card.on_box_id] += 1
+                if len(chunk) == chunk_size:
+                    Card.objects.bulk_create(chunk)
+                    chunk = []
+        except (csv.Error, UnicodeDecodeError) as e:
+            total_errors += 1
+            errors.append(RowError(reader.line_num + 1, f'Could not read the file: {e}'))
+        if total_errors:
+            raise CardImportError(errors, total_errors)
+        Card.objects.bulk_create(chunk)
+        Box.update_card_counts(imported_by_box)
+    # bulk_create doesn't send signals
+    caching.invalidate_box_summaries(deck.pk)
+    return imported
+
+
+def _card_from_row(row: List[str], deck: Deck, box_ids: Dict[int, int], is_first_row: bool) -> Optional[Card]:
+    if not any(column.strip() for column in row):
+        return None
+    if is_first_row and [column.strip().lower() for column in row[:2]] == ['front', 'back']:
+        return None
+    if len(row) not in (2, 3):
+        raise ValueError(f'Expected 2 or 3 columns, got {len(row)}')
+    front_text, back_text = row[0].strip(), row[1].strip()
+    if not front_text or not back_text:
+        raise ValueError('The front and back texts can\'t be empty')
+    if len(front_text) > Card._meta.get_field('front_text').max_length:
+        raise ValueError('The front text is too long')
+    box_type = row[2].strip() if len(row) == 3 and row[2].strip() else '0'
+    try:
+        box_id = box_ids[int(box_type)]
+    except (KeyError, ValueError):
+        raise ValueError(f'There is no box of type "{box_type}" in this deck')
+    return Card(front_text=front_text, back_text=back_text, on_deck=deck, on_box_id=box_id)
@@ -0,0 +1,31 @@
+from django.core.management import BaseCommand, CommandError
+
+from flashcards.leitner.importing import CardImportError, delimiter_for, import_cards
+from flashcards.leitner.models import Deck
+
+
+class Command(BaseCommand):
+    help = 'Imports cards into a deck from a CSV/TSV file with the columns: front, back and optionally box type'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deck_id', type=int)
+        parser.add_argument('path', help='CSV or TSV file. The delimiter is chosen by its extension')
+        parser.add_argument('--delimiter', help='Overrides the delimiter chosen by the file extension')
+
+    def handle(self, *args, **options):
+        try:
+            deck = Deck.objects.get(pk=options['deck_id'])
+        except Deck.DoesNotExist:
+            raise CommandError(f'Deck {options["deck_id"]} does not exist')
+
+        delimiter = options['delimiter'] or delimiter_for(options['path'])
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as file:
+                imported = import_cards(deck, file, delimiter)
+        except OSError as e:
+            raise CommandError(e)
+        except CardImportError as e:
+            for error in e.errors:
+                self.stderr.write(f'Line {error.line}: {error.message}')
+            raise CommandError(f'{e}, nothing was imported')
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} cards into "{deck}"'))
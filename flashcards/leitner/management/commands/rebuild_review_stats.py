@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from flashcards.leitner.models import BoxLadder, DailyReviewStats, ReviewLog
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily review statistics from the review log'
+    chunk_size = 2000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deck', type=int, help='Only rebuild the statistics of this deck')
+
+    def handle(self, *args, **options):
+        reviews = ReviewLog.objects.all()
+        if options['deck'] is not None:
+            reviews = reviews.filter(deck=options['deck'])
+        deck_ids = list(reviews.order_by().values_list('deck', flat=True).distinct())
+        for deck_id in deck_ids:
+            last_box_type = BoxLadder.for_deck(deck_id).last_box_type
+            with transaction.atomic():
+                DailyReviewStats.objects.filter(deck=deck_id).delete()
+                chunk = []
+                for review in reviews.filter(deck=deck_id).order_by('pk').iterator(chunk_size=self.chunk_size):
+                    chunk.append(review)
+                    if len(chunk) == self.chunk_size:
+                        DailyReviewStats.record(chunk, last_box_type)
+                        chunk = []
+                DailyReviewStats.record(chunk, last_box_type)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the review statistics of {len(deck_ids)} decks'))
@@ -0,0 +1,17 @@
+from django.core.management import BaseCommand
+
+from flashcards.leitner.models import Box
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the card count of every box from its cards, fixing counts that got out of sync'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deck', type=int, help='Only recount the boxes of this deck')
+
+    def handle(self, *args, **options):
+        boxes = Box.objects.all()
+        if options['deck'] is not None:
+            boxes = boxes.filter(deck=options['deck'])
+        updated = Box.recount_cards(boxes)
+        self.stdout.write(self.style.SUCCESS(f'Recounted the cards of {updated} boxes'))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leitner', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='card_queue',
+            field=models.TextField(null=True, verbose_name='Comma separated ids of the cards to study, in order'),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='cursor',
+            field=models.PositiveIntegerField(default=0, verbose_name='Position of the current card in the queue'),
+        ),
+    ]
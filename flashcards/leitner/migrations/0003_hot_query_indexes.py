@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:29
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicated_finished_cards(apps, schema_editor):
+    """ Keeps the first row of every (session, card) pair so the unique constraint can be created """
+    SessionFinishedCards = apps.get_model('leitner', 'SessionFinishedCards')
+    keep = SessionFinishedCards.objects.values('session', 'card').annotate(keep=Min('pk')).values('keep')
+    SessionFinishedCards.objects.exclude(pk__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leitner', '0002_session_card_queue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['on_box', 'updated_at'], name='leitner_card_box_updated_idx'),
+        ),
+        migrations.RunPython(remove_duplicated_finished_cards, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sessionfinishedcards',
+            constraint=models.UniqueConstraint(fields=('session', 'card'), name='leitner_finished_session_card_uniq'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_cards(apps, schema_editor):
+    Box = apps.get_model('leitner', 'Box')
+    Card = apps.get_model('leitner', 'Card')
+    cards = Card.objects.filter(on_box=OuterRef('pk')).order_by().values('on_box').annotate(
+        count=Count('pk')).values('count')
+    Box.objects.update(card_count=Coalesce(Subquery(cards), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leitner', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='box',
+            name='card_count',
+            field=models.IntegerField(default=0, verbose_name='Amount of cards on the box'),
+        ),
+        migrations.RunPython(count_cards, migrations.RunPython.noop),
+    ]
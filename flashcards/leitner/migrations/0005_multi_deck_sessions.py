@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def set_session_users(apps, schema_editor):
+    Session = apps.get_model('leitner', 'Session')
+    Deck = apps.get_model('leitner', 'Deck')
+    Session.objects.update(user=Subquery(Deck.objects.filter(pk=OuterRef('deck')).values('created_by')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('leitner', '0004_box_card_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='boxes',
+            field=models.ManyToManyField(blank=True, related_name='multi_deck_sessions', to='leitner.box'),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='study_sessions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='current_box',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='session', to='leitner.box'),
+        ),
+        migrations.AlterField(
+            model_name='session',
+            name='deck',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='session', to='leitner.deck'),
+        ),
+        migrations.RunPython(set_session_users, migrations.RunPython.noop),
+    ]
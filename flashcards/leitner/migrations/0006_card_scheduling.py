@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leitner', '0005_multi_deck_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='due_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next review on'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='ease',
+            field=models.FloatField(default=2.5, verbose_name='SM-2 ease factor'),
+        ),
+        migrations.AddField(
+            model_name='card',
+            name='interval',
+            field=models.PositiveIntegerField(default=0, verbose_name='Days between the last two reviews, 0 if never answered'),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='card_scheduling',
+            field=models.BooleanField(default=False, verbose_name='Study the cards by their own due date?'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['on_deck', 'due_at'], name='leitner_card_deck_due_idx'),
+        ),
+    ]
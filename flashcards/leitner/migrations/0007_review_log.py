@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def snapshot_legacy_queues(apps, schema_editor):
+    # Sessions started without a queue snapshot relied on SessionFinishedCards to know what was left to study
+    Session = apps.get_model('leitner', 'Session')
+    Card = apps.get_model('leitner', 'Card')
+    for session in Session.objects.filter(card_queue__isnull=True):
+        card_ids = Card.objects.filter(on_box=session.current_box_id).exclude(
+            finished_session__session=session).order_by('updated_at').values_list('pk', flat=True)
+        session.card_queue = ','.join(map(str, card_ids))
+        session.cursor = 0
+        session.save(update_fields=['card_queue', 'cursor'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('leitner', '0006_card_scheduling'),
+    ]
+
+    operations = [
+        migrations.RunPython(snapshot_legacy_queues, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ReviewLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reviewed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Answered on')),
+                ('correct', models.BooleanField(verbose_name='Was the answer correct?')),
+                ('from_box', models.PositiveSmallIntegerField(verbose_name='Box type of the card when it was answered')),
+                ('to_box', models.PositiveSmallIntegerField(verbose_name='Box type the card was moved to')),
+                ('card', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='leitner.card')),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to='leitner.deck')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviews', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.DeleteModel(
+            name='SessionFinishedCards',
+        ),
+        migrations.AddIndex(
+            model_name='reviewlog',
+            index=models.Index(fields=['deck', 'reviewed_at'], name='leitner_review_deck_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewlog',
+            index=models.Index(fields=['user', 'reviewed_at'], name='leitner_review_user_time_idx'),
+        ),
+    ]
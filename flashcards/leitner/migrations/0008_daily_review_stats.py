@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leitner', '0007_review_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyReviewStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('box_type', models.PositiveSmallIntegerField(verbose_name='Box type of the answered cards')),
+                ('day', models.DateField(verbose_name='Day of the answers, in the current time zone')),
+                ('reviews', models.PositiveIntegerField(default=0, verbose_name='Amount of answers')),
+                ('correct', models.PositiveIntegerField(default=0, verbose_name='Amount of correct answers')),
+                ('graduated', models.PositiveIntegerField(default=0, verbose_name='Amount of cards moved to the last box')),
+                ('graduation_seconds', models.BigIntegerField(default=0, verbose_name='Total time the graduated cards took to reach the last box since their first review')),
+                ('deck', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='leitner.deck')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyreviewstats',
+            constraint=models.UniqueConstraint(fields=('deck', 'day', 'box_type'), name='leitner_daily_stats_uniq'),
+        ),
+    ]
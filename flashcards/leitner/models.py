@@ -1,7 +1,16 @@
-from typing import Optional
+import heapq
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from django.conf import settings
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Case, Count, F, Min, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from flashcards.leitner import caching
 
 """
 Models for the Leitner System, see  https://en.wikipedia.org/wiki/Leitner_system
@@ -11,12 +20,16 @@ Models for the Leitner System, see  https://en.wikipedia.org/wiki/Leitner_system
 class Deck(models.Model):
     description = models.CharField('Deck description', max_length=150)
     created_by = models.ForeignKey(to=settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='decks')
+    card_scheduling = models.BooleanField('Study the cards by their own due date?', default=False)
 
     def create_boxes(self):
         defaults = {'in_session': False, 'last_used': None, 'deck': self}
-        Box.objects.create(description='Use this every day', box_type=0, **defaults)
-        Box.objects.create(description='Use this every tuesday and thursday', box_type=1, **defaults)
-        Box.objects.create(description='Use this every friday', box_type=2, **defaults)
+        boxes = [
+            Box.objects.create(description='Use this every day', box_type=0, **defaults),
+            Box.objects.create(description='Use this every tuesday and thursday', box_type=1, **defaults),
+            Box.objects.create(description='Use this every friday', box_type=2, **defaults),
+        ]
+        BoxLadder.remember(self.pk, {box.box_type: box.pk for box in boxes})
 
     def __str__(self):
         return self.description
@@ -28,6 +41,55 @@ class Box(models.Model):
     in_session = models.BooleanField('Box currently in session?', default=False)
     box_type = models.IntegerField('0: Everyday, 1: Tue/Thu, 2: Fri')
     last_used = models.DateTimeField(null=True)
+    card_count = models.IntegerField('Amount of cards on the box', default=0)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # card_count is only changed with F() expressions, saving a stale value would undo other changes
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'card_count']
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def update_card_counts(deltas: Dict[int, int]) -> None:
+        """
+        Adds the deltas to the card counts of the boxes in a single UPDATE
+
+        Args:
+            deltas: Amount of cards to add (or remove, if negative) by box id
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if deltas:
+            Box.objects.filter(pk__in=deltas).update(card_count=Case(
+                *(When(pk=pk, then=F('card_count') + delta) for pk, delta in deltas.items()),
+                default=F('card_count'),
+            ))
+
+    @staticmethod
+    def recount_cards(boxes: models.QuerySet) -> int:
+        """ Sets the card count of the boxes from their actual cards, returning the amount of updated boxes """
+        cards = Card.objects.filter(on_box=OuterRef('pk')).order_by().values('on_box').annotate(
+            count=Count('pk')).values('count')
+        return boxes.update(card_count=Coalesce(Subquery(cards), Value(0)))
+
+    def card_page(self, after: Optional[int] = None, size: int = 50) -> Tuple[List['Card'], Optional[int]]:
+        """
+        Gets a page of the cards of this box, ordered by id and loading only what is needed to list them
+
+        Args:
+            after: Id of the last card of the previous page. The first page is returned if not given
+            size: Amount of cards per page
+
+        Returns:
+            tuple: Cards of the page and the value of `after` to get the next page, None if this is the last page
+        """
+        qs = self.cards.order_by('pk').only('pk', 'front_text', 'on_box_id')
+        if after is not None:
+            qs = qs.filter(pk__gt=after)
+        cards = list(qs[:size + 1])
+        if len(cards) > size:
+            return cards[:size], cards[size - 1].pk
+        return cards, None
 
     def last_used_text(self):
         return 'Never' if self.last_used is None else self.last_used.strftime('%a %d %b %Y %H:%M')
@@ -36,41 +98,301 @@ class Box(models.Model):
         return f'Box: {self.description} | Last used: {self.last_used_text()}'
 
 
+class BoxLadder:
+    """
+    Maps the box types of a deck to the ids of its boxes, so moving a card between boxes doesn't need to query
+    them. Ladders are cached per process by BoxLadder.for_deck and invalidated when a box is saved or deleted. Only
+    the most recently used ones are kept
+    """
+    MAX_CACHED = 1000
+    _cache: 'OrderedDict[int, BoxLadder]' = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, box_ids: Dict[int, int]):
+        self.box_ids = box_ids
+        self.box_types = {pk: box_type for box_type, pk in box_ids.items()}
+
+    @classmethod
+    def for_deck(cls, deck_id: int) -> 'BoxLadder':
+        """ Gets the ladder of the deck, loading it with a single query if it isn't cached """
+        with cls._lock:
+            ladder = cls._cache.get(deck_id)
+            if ladder is not None:
+                cls._cache.move_to_end(deck_id)
+                return ladder
+        ladder = cls(dict(Box.objects.filter(deck=deck_id).values_list('box_type', 'pk')))
+        if ladder.box_ids:
+            cls._store(deck_id, ladder)
+        return ladder
+
+    @classmethod
+    def remember(cls, deck_id: int, box_ids: Dict[int, int]) -> None:
+        cls._store(deck_id, cls(box_ids))
+
+    @classmethod
+    def invalidate(cls, deck_id: int) -> None:
+        with cls._lock:
+            cls._cache.pop(deck_id, None)
+
+    @classmethod
+    def _store(cls, deck_id: int, ladder: 'BoxLadder') -> None:
+        with cls._lock:
+            cls._cache[deck_id] = ladder
+            cls._cache.move_to_end(deck_id)
+            if len(cls._cache) > cls.MAX_CACHED:
+                cls._cache.popitem(last=False)
+
+    @property
+    def last_box_type(self) -> int:
+        return len(self.box_ids) - 1
+
+    def first_box(self) -> int:
+        return self.box_ids[0]
+
+    def next_box(self, box_id: int) -> int:
+        """ Gets the box that follows the given one. Nothing happens if it is the last box """
+        box_type = self.box_types[box_id]
+        if box_type < len(self.box_ids) - 1:
+            return self.box_ids[box_type + 1]
+        return box_id
+
+
 class Card(models.Model):
+    """
+    Card of a deck. Besides its Leitner box, every answer schedules the card on its own with SM-2, see
+    https://en.wikipedia.org/wiki/SuperMemo#Description_of_SM-2_algorithm. Decks with `card_scheduling` study
+    the cards by their `due_at` instead of by box
+    """
+    # SM-2 answer quality (0 to 5) of a correct and a wrong answer
+    CORRECT_QUALITY = 4
+    WRONG_QUALITY = 2
+    MIN_EASE = 1.3
+
     front_text = models.CharField('Front text', max_length=150)
     back_text = models.TextField('Back text')
     updated_at = models.DateTimeField('Last modified on', auto_now=True)
     on_deck = models.ForeignKey(to=Deck, on_delete=models.CASCADE, related_name='cards')
     on_box = models.ForeignKey(to=Box, on_delete=models.CASCADE, related_name='cards')
+    due_at = models.DateTimeField('Next review on', default=timezone.now)
+    interval = models.PositiveIntegerField('Days between the last two reviews, 0 if never answered', default=0)
+    ease = models.FloatField('SM-2 ease factor', default=2.5)
+
+    class Meta:
+        indexes = [
+            # Cards of a box in study order, used to build the session queue
+            models.Index(fields=['on_box', 'updated_at'], name='leitner_card_box_updated_idx'),
+            # Due cards of a deck, a range scan on due_at
+            models.Index(fields=['on_deck', 'due_at'], name='leitner_card_deck_due_idx'),
+        ]
 
-    def correct_answer(self) -> None:
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Box.update_card_counts({self.on_box_id: 1})
+
+    def delete(self, *args, **kwargs):
+        # Deleting a box or deck deletes its cards without calling this, but then the counts are deleted too
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            Box.update_card_counts({self.on_box_id: -1})
+        caching.invalidate_box_summaries(self.on_deck_id)
+        return deleted
+
+    @classmethod
+    def due(cls, deck: Deck, now: Optional[datetime] = None) -> models.QuerySet:
+        """ Gets the cards of the deck that are due, ordered by due date. It is a range scan on the due index """
+        return cls.objects.filter(on_deck=deck, due_at__lte=now or timezone.now()).order_by('due_at')
+
+    def schedule(self, correct: bool, now: Optional[datetime] = None) -> None:
         """
-        Moves the card to the next box, given a correct answer. Requires the box to be in a session
+        Updates the SM-2 interval, ease and due date of the card given an answer, without saving it. A wrong
+        answer makes the card due again the next day
+
+        Args:
+            correct: Whether the answer was correct
+            now: Time of the answer. Defaults to the current time
         """
-        current_box_num = self.on_box.box_type
+        if correct:
+            quality = self.CORRECT_QUALITY
+            self.interval = 1 if self.interval == 0 else 6 if self.interval == 1 else round(self.interval * self.ease)
+        else:
+            quality = self.WRONG_QUALITY
+            self.interval = 1
+        self.ease = max(self.MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.due_at = (now or timezone.now()) + timedelta(days=self.interval)
 
-        if current_box_num < self.on_deck.boxes.count() - 1:
-            # Nothing happens if the card is on the last box
-            self.on_box = self.on_deck.boxes.get(box_type=current_box_num + 1)
-            self.save()
+    def _answer(self, correct: bool, session: Optional['Session']) -> None:
+        ladder = BoxLadder.for_deck(self.on_deck_id)
+        session = session or Session.objects.get(deck=self.on_deck_id)
+        from_box_id = self.on_box_id
+        # A correct answer on the last box leaves the card there, but it is still scheduled
+        self.on_box_id = ladder.next_box(from_box_id) if correct else ladder.first_box()
+        now = timezone.now()
+        self.schedule(correct, now)
+        review = ReviewLog(card=self, deck_id=self.on_deck_id, user_id=session.user_id, reviewed_at=now,
+                           correct=correct, from_box=ladder.box_types[from_box_id],
+                           to_box=ladder.box_types[self.on_box_id])
+        # The card, its boxes, the review log, the session cursor and the statistics change together
+        with transaction.atomic():
+            self.save(update_fields=['on_box', 'updated_at', 'due_at', 'interval', 'ease'])
+            if self.on_box_id != from_box_id:
+                Box.update_card_counts({from_box_id: -1, self.on_box_id: 1})
+            session.finish_card(self, review)
+            DailyReviewStats.record([review], ladder.last_box_type)
 
-        SessionFinishedCards.objects.create(session=self.on_deck.session.get(), card=self)
+    def correct_answer(self, session: Optional['Session'] = None) -> None:
+        """
+        Moves the card to the next box, given a correct answer. Requires the box to be in a session
 
-    def wrong_answer(self) -> None:
+        Args:
+            session: Session of the deck. It is fetched if not given
+        """
+        self._answer(True, session)
+
+    def wrong_answer(self, session: Optional['Session'] = None) -> None:
         """
         Moves the card to the box type 0, given a wrong answer. Requires the box to be in a session
+
+        Args:
+            session: Session of the deck. It is fetched if not given
         """
-        self.on_box = self.on_deck.boxes.get(box_type=0)
-        self.save()
-        SessionFinishedCards.objects.create(session=self.on_deck.session.get(), card=self)
+        self._answer(False, session)
 
 
 class Session(models.Model):
-    deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name='session')
-    current_box = models.ForeignKey(Box, on_delete=models.CASCADE, related_name='session')
+    """
+    Study session of a box. Multi-deck sessions study every due box of the user at once, they have no deck and
+    no current box
+    """
+    deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name='session', null=True)
+    current_box = models.ForeignKey(Box, on_delete=models.CASCADE, related_name='session', null=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='study_sessions',
+                             null=True)
+    boxes = models.ManyToManyField(Box, related_name='multi_deck_sessions', blank=True)
     total_cards_on_box = models.IntegerField('Total cards of the current box')
     is_finished = models.BooleanField('Is the session finished?', default=False)
 
+    card_queue = models.TextField('Comma separated ids of the cards to study, in order', null=True)
+    cursor = models.PositiveIntegerField('Position of the current card in the queue', default=0)
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None and self.deck_id is not None:
+            # Reviews are recorded for the user of the session
+            self.user_id = self.deck.created_by_id
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def start(cls, deck: Deck, box: Box) -> 'Session':
+        """
+        Creates a session for the given box, taking a snapshot of the cards it currently holds.
+
+        Cards created after the session started are left for the next session. Editing a card does not change
+        its position in the queue, and deleted cards are skipped.
+        """
+        card_ids = list(box.cards.order_by('updated_at').values_list('pk', flat=True))
+        return cls.objects.create(deck=deck, current_box=box, user_id=deck.created_by_id,
+                                  total_cards_on_box=len(card_ids), card_queue=','.join(map(str, card_ids)),
+                                  is_finished=False)
+
+    @classmethod
+    def start_due(cls, deck: Deck, now: Optional[datetime] = None,
+                  due_cards: Optional[List[Tuple[int, int]]] = None) -> 'Session':
+        """
+        Creates a session for the cards of the deck that are due, taking a snapshot of them ordered by due date.
+        The session has no current box, the cards may be on any box. Cards on boxes studied in another session
+        are left out, and the boxes of the session are marked as in session until it finishes
+
+        Args:
+            deck: Deck to study
+            now: Time used to compute what is due. Defaults to the current time
+            due_cards: Ids and box ids of the due cards, as given by `Session.due_cards`, if they were already loaded
+        """
+        if due_cards is None:
+            due_cards = cls.due_cards(deck, now)
+        box_ids = {box_id for _, box_id in due_cards}
+        with transaction.atomic():
+            session = cls.objects.create(deck=deck, user_id=deck.created_by_id, total_cards_on_box=len(due_cards),
+                                         card_queue=','.join(str(pk) for pk, _ in due_cards), is_finished=False)
+            Session.boxes.through.objects.bulk_create(
+                [Session.boxes.through(session=session, box_id=box_id) for box_id in box_ids])
+            Box.objects.filter(pk__in=box_ids).update(in_session=True)
+        # QuerySet.update doesn't send signals
+        caching.invalidate_box_summaries(deck.pk)
+        return session
+
+    @staticmethod
+    def due_cards(deck: Deck, now: Optional[datetime] = None) -> List[Tuple[int, int]]:
+        """ Gets the ids and box ids of the due cards of the deck that can be studied, ordered by due date """
+        return list(Card.due(deck, now).filter(on_box__in_session=False).values_list('pk', 'on_box'))
+
+    @classmethod
+    def start_multi_deck(cls, user, boxes: List[Box]) -> 'Session':
+        """
+        Creates a session studying several boxes, usually of different decks. The cards of every box are merged
+        in a single queue ordered by the due time of their box, taking one card of each box in turn when several
+        boxes are due at the same time. It costs the same amount of queries no matter how many boxes there are
+
+        Args:
+            user: Owner of the boxes
+            boxes: Boxes to study, annotated with `due_since`
+        """
+        due_since = {box.pk: box.due_since for box in boxes}
+        cards_by_box = defaultdict(list)
+        cards = Card.objects.filter(on_box__in=due_since).order_by('on_box', 'updated_at', 'pk').values_list(
+            'pk', 'on_box')
+        for pk, box_id in cards:
+            cards_by_box[box_id].append((due_since[box_id], len(cards_by_box[box_id]), box_id, pk))
+        card_ids = [pk for *_, pk in heapq.merge(*cards_by_box.values())]
+
+        with transaction.atomic():
+            session = cls.objects.create(user=user, total_cards_on_box=len(card_ids),
+                                         card_queue=','.join(map(str, card_ids)), is_finished=False)
+            Session.boxes.through.objects.bulk_create(
+                [Session.boxes.through(session=session, box_id=box_id) for box_id in due_since])
+            Box.objects.filter(pk__in=due_since).update(in_session=True)
+        # QuerySet.update doesn't send signals
+        for deck_id in {box.deck_id for box in boxes}:
+            caching.invalidate_box_summaries(deck_id)
+        return session
+
+    @property
+    def is_multi_deck(self) -> bool:
+        return self.deck_id is None
+
+    def finish(self) -> None:
+        """ Marks the boxes of the session as used and deletes it """
+        now = timezone.now()
+        with transaction.atomic():
+            if self.current_box_id is None:
+                # Multi deck and due cards sessions
+                boxes = Box.objects.filter(multi_deck_sessions=self)
+                deck_ids = set(boxes.values_list('deck', flat=True))
+                Box.objects.filter(pk__in=boxes.values('pk')).update(last_used=now, in_session=False)
+            else:
+                if (box := self.current_box) is not None:
+                    box.last_used = now
+                    box.in_session = False
+                    box.save()
+                deck_ids = set()
+            self.delete()
+        for deck_id in deck_ids:
+            caching.invalidate_box_summaries(deck_id)
+
+    def queued_card_ids(self) -> List[int]:
+        """
+        Gets the ids of the cards of this session, in the order they will be studied. Sessions created without a
+        snapshot take it here from the cards on the box
+        """
+        if self.card_queue is None:
+            card_ids = Card.objects.filter(on_box=self.current_box_id).order_by('updated_at').values_list(
+                'pk', flat=True)
+            self.card_queue = ','.join(map(str, card_ids))
+            self.cursor = 0
+            self.save(update_fields=['card_queue', 'cursor'])
+        return [int(pk) for pk in self.card_queue.split(',') if pk]
+
     def current_card(self) -> Optional[Card]:
         """
         Gets the next card to use in the study session
@@ -78,11 +400,176 @@ class Session(models.Model):
         Returns:
             Card or None: Next available card. If it doesn't exist returns None
         """
-        qs = Card.objects.filter(on_box=self.current_box).exclude(finished_session__session=self).order_by(
-            'updated_at').first()
-        return qs
+        card_ids = self.queued_card_ids()
+        start = self.cursor
+        card = None
+        while card is None and self.cursor < len(card_ids):
+            if self.is_multi_deck:
+                card = Card.objects.filter(pk=card_ids[self.cursor], on_deck__created_by=self.user_id).select_related(
+                    'on_deck').first()
+            elif self.current_box_id is None:
+                card = Card.objects.filter(pk=card_ids[self.cursor], on_deck=self.deck_id).first()
+            else:
+                card = Card.objects.filter(pk=card_ids[self.cursor], on_box=self.current_box_id).first()
+            if card is None:
+                # The card was deleted or moved to another box since the session started
+                self.cursor += 1
+        if self.cursor != start:
+            self.save(update_fields=['cursor'])
+        return card
+
+    def finish_card(self, card: Card, review: 'ReviewLog') -> None:
+        """
+        Records the review of the card, moving the cursor past it if it was the current card
+        """
+        review.save()
+        card_ids = self.queued_card_ids()
+        if self.cursor < len(card_ids) and card_ids[self.cursor] == card.pk:
+            self.cursor += 1
+            self.save(update_fields=['cursor'])
+
+    def apply_answers(self, answers: Iterable[Tuple[int, bool]]) -> int:
+        """
+        Applies a batch of answers in a single transaction. The amount of queries doesn't depend on the size of
+        the batch
+
+        Args:
+            answers: Pairs of (card id, whether the answer was correct). Every card must be pending in this session
+
+        Returns:
+            int: Amount of answers applied
+
+        Raises:
+            ValueError: If a card is repeated or is not pending in this session. Nothing is applied in that case
+        """
+        answers = list(answers)
+        correct_by_card = dict(answers)
+        if len(correct_by_card) != len(answers):
+            raise ValueError('A card was answered more than once')
+        card_ids = self.queued_card_ids()
+        pending = card_ids[self.cursor:]
+        if not set(pending).issuperset(correct_by_card):
+            raise ValueError('Some cards are not pending in this session')
+
+        ladder = BoxLadder.for_deck(self.deck_id)
+        now = timezone.now()
+        cards = Card.objects.filter(pk__in=correct_by_card).only('pk', 'on_box', 'interval', 'ease')
+        if self.current_box_id is None:
+            cards = list(cards.filter(on_deck=self.deck_id))
+        else:
+            cards = list(cards.filter(on_box=self.current_box_id))
+        if len(cards) != len(correct_by_card):
+            raise ValueError('Some cards are not pending in this session')
+
+        deltas = defaultdict(int)
+        reviews = []
+        for card in cards:
+            correct = correct_by_card[card.pk]
+            from_box_id = card.on_box_id
+            card.on_box_id = ladder.next_box(from_box_id) if correct else ladder.first_box()
+            deltas[from_box_id] -= 1
+            deltas[card.on_box_id] += 1
+            card.updated_at = now
+            card.schedule(correct, now)
+            reviews.append(ReviewLog(
+                card=card, deck_id=self.deck_id, user_id=self.user_id, reviewed_at=now, correct=correct,
+                from_box=ladder.box_types[from_box_id], to_box=ladder.box_types[card.on_box_id]))
+
+        # Answered cards are moved right before the cursor, so the queue keeps the order they were studied in
+        answered = [pk for pk in pending if pk in correct_by_card]
+        unanswered = [pk for pk in pending if pk not in correct_by_card]
+        self.card_queue = ','.join(map(str, card_ids[:self.cursor] + answered + unanswered))
+        self.cursor += len(answered)
+        self.is_finished = not unanswered
+
+        with transaction.atomic():
+            Card.objects.bulk_update(cards, ['on_box', 'updated_at', 'due_at', 'interval', 'ease'])
+            Box.update_card_counts(deltas)
+            ReviewLog.objects.bulk_create(reviews)
+            DailyReviewStats.record(reviews, ladder.last_box_type)
+            self.save(update_fields=['card_queue', 'cursor', 'is_finished'])
+        # bulk_update doesn't send signals
+        caching.invalidate_box_summaries(self.deck_id)
+        return len(cards)
+
+
+class ReviewLog(models.Model):
+    """
+    Append-only history of the answers. Rows are never updated, and they are kept when the session finishes or
+    the card is deleted. Box types are stored instead of boxes, so they keep their meaning
+    """
+    card = models.ForeignKey(Card, on_delete=models.SET_NULL, related_name='reviews', null=True)
+    deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name='reviews')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='reviews')
+    reviewed_at = models.DateTimeField('Answered on', default=timezone.now)
+    correct = models.BooleanField('Was the answer correct?')
+    from_box = models.PositiveSmallIntegerField('Box type of the card when it was answered')
+    to_box = models.PositiveSmallIntegerField('Box type the card was moved to')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deck', 'reviewed_at'], name='leitner_review_deck_time_idx'),
+            models.Index(fields=['user', 'reviewed_at'], name='leitner_review_user_time_idx'),
+        ]
+
+
+class DailyReviewStats(models.Model):
+    """
+    Daily rollup of the review log by deck and by the box type cards were answered on. Rows are updated as answers
+    are recorded, so statistics read a few of them instead of the whole log
+    """
+    deck = models.ForeignKey(Deck, on_delete=models.CASCADE, related_name='daily_stats')
+    box_type = models.PositiveSmallIntegerField('Box type of the answered cards')
+    day = models.DateField('Day of the answers, in the current time zone')
+    reviews = models.PositiveIntegerField('Amount of answers', default=0)
+    correct = models.PositiveIntegerField('Amount of correct answers', default=0)
+    graduated = models.PositiveIntegerField('Amount of cards moved to the last box', default=0)
+    graduation_seconds = models.BigIntegerField(
+        'Total time the graduated cards took to reach the last box since their first review', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['deck', 'day', 'box_type'], name='leitner_daily_stats_uniq'),
+        ]
+
+    @classmethod
+    def record(cls, reviews: List[ReviewLog], last_box_type: int) -> None:
+        """
+        Adds saved reviews to the rollups. It costs one upsert, plus one query to find the first review of the cards
+        that reached the last box
+
+        Args:
+            reviews: Saved reviews
+            last_box_type: Box type of the last box of the decks of the reviews
+        """
+        graduating = {review.card_id for review in reviews
+                      if review.to_box == last_box_type and review.from_box != last_box_type}
+        first_reviews = {}
+        if graduating:
+            first_reviews = dict(ReviewLog.objects.filter(card__in=graduating).order_by().values('card').annotate(
+                first=Min('reviewed_at')).values_list('card', 'first'))
 
+        totals = defaultdict(lambda: {'reviews': 0, 'correct': 0, 'graduated': 0, 'graduation_seconds': 0})
+        for review in reviews:
+            total = totals[(review.deck_id, review.from_box, timezone.localdate(review.reviewed_at))]
+            total['reviews'] += 1
+            total['correct'] += review.correct
+            if review.card_id in graduating:
+                first_review = first_reviews.get(review.card_id, review.reviewed_at)
+                total['graduated'] += 1
+                total['graduation_seconds'] += int((review.reviewed_at - first_review).total_seconds())
 
-class SessionFinishedCards(models.Model):
-    session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='finished_cards')
-    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='finished_session')
+        if not totals:
+            return
+        # A single upsert adds to the rows of every deck, box type and day, creating the missing ones
+        fields = ('reviews', 'correct', 'graduated', 'graduation_seconds')
+        table = cls._meta.db_table
+        rows = [(deck_id, box_type, connection.ops.adapt_datefield_value(day), *(total[field] for field in fields))
+                for (deck_id, box_type, day), total in totals.items()]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (deck_id, box_type, day, {", ".join(fields)}) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(rows))} '
+                f'ON CONFLICT (deck_id, day, box_type) DO UPDATE SET '
+                + ', '.join(f'{field} = {table}.{field} + excluded.{field}' for field in fields),
+                [value for row in rows for value in row])
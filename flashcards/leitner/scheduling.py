@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.db.models import (
+    Case, DateTimeField, DurationField, ExpressionWrapper, F, Func, PositiveIntegerField, Q, QuerySet, Value, When,
+)
+from django.utils import timezone
+
+from flashcards.leitner.models import Box, BoxLadder, Card, Deck
+
+"""
+Works out which boxes are due from their type. A box is due when it has cards and it wasn't used since the
+start of its last scheduled day, so a box that was skipped on its day stays due until it is studied.
+
+Decks can also schedule each card on its own, see Card.schedule
+"""
+
+# Weekdays (Monday is 0) when each box type is studied
+SCHEDULE: Dict[int, Tuple[int, ...]] = {
+    0: (0, 1, 2, 3, 4, 5, 6),
+    1: (1, 3),
+    2: (4,),
+}
+
+# Days until a card that was never answered is due again when a deck switches to card scheduling, by box type
+BOX_INTERVALS: Dict[int, int] = {0: 1, 1: 3, 2: 7}
+
+
+class Days(Func):
+    """ Duration of the given amount of days, the backends can't multiply a number and a duration the same way """
+    template = "(%(expressions)s * INTERVAL '1 day')"
+    output_field = DurationField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite stores durations as microseconds
+        return self.as_sql(compiler, connection, template='(%(expressions)s * 86400000000)', **extra_context)
+
+
+def due_since(box_type: int, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Gets the start of the last scheduled day of the box type, today included
+
+    Returns:
+        datetime or None: Start of the day in the current time zone. None if the box type has no schedule
+    """
+    if box_type not in SCHEDULE:
+        return None
+    today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    days_since = min((today.weekday() - weekday) % 7 for weekday in SCHEDULE[box_type])
+    return timezone.make_aware(today.replace(tzinfo=None) - timedelta(days=days_since))
+
+
+def due_boxes(user, now: Optional[datetime] = None) -> QuerySet:
+    """
+    Gets the due boxes of every deck of the user with a single query, annotated with `due_since` and ordered by it
+
+    Args:
+        user: Owner of the decks
+        now: Time used to compute what is due. Defaults to the current time
+    """
+    thresholds = {box_type: due_since(box_type, now) for box_type in SCHEDULE}
+    not_used_since = Q()
+    for box_type, since in thresholds.items():
+        not_used_since |= Q(box_type=box_type) & (Q(last_used__isnull=True) | Q(last_used__lt=since))
+    return Box.objects.filter(
+        not_used_since, deck__created_by=user, in_session=False, card_count__gt=0,
+    ).annotate(
+        due_since=Case(*(When(box_type=box_type, then=Value(since)) for box_type, since in thresholds.items()),
+                       output_field=DateTimeField()),
+    ).select_related('deck').order_by('due_since', 'deck', 'box_type')
+
+
+def reschedule_deck(deck: Deck) -> int:
+    """
+    Recomputes the due date of every card of the deck from its last change and its interval. Cards that were
+    never answered first get the interval of their box. It is a single UPDATE, no matter how many cards the deck has
+
+    Returns:
+        int: Amount of rescheduled cards
+    """
+    box_ids = BoxLadder.for_deck(deck.pk).box_ids
+    interval = Case(
+        When(interval=0, then=Case(
+            *(When(on_box=box_id, then=Value(BOX_INTERVALS.get(box_type, 1))) for box_type, box_id in box_ids.items()),
+            default=Value(1),
+        )),
+        default=F('interval'),
+        output_field=PositiveIntegerField(),
+    )
+    # Both assignments read the interval the card had before the UPDATE
+    return Card.objects.filter(on_deck=deck).update(interval=interval, due_at=ExpressionWrapper(
+        F('updated_at') + Days(interval), output_field=DateTimeField()))
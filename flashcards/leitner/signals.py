@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from flashcards.leitner import caching
+from flashcards.leitner.models import Box, BoxLadder, Card, Deck
+
+
+@receiver([post_save, post_delete], sender=Box)
+def invalidate_box_ladder(sender, instance: Box, **kwargs):
+    BoxLadder.invalidate(instance.deck_id)
+
+
+@receiver([post_save, post_delete], sender=Deck)
+def invalidate_deck_caches(sender, instance: Deck, **kwargs):
+    caching.invalidate_deck_list(instance.created_by_id)
+    caching.invalidate_box_summaries(instance.pk)
+
+
+# Cards have no post_delete receiver, it would make deleting a deck or box load its cards to send one signal each.
+# Card.delete invalidates, and deleting a box or deck invalidates once for all of their cards
+@receiver([post_save, post_delete], sender=Box)
+@receiver(post_save, sender=Card)
+def invalidate_box_summaries(sender, instance, **kwargs):
+    caching.invalidate_box_summaries(instance.deck_id if sender is Box else instance.on_deck_id)
@@ -0,0 +1,58 @@
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from flashcards.leitner.models import DailyReviewStats, Deck
+
+"""
+Study statistics of a deck, read from the daily rollups of the review log
+"""
+
+TOTALS = ('reviews', 'correct', 'graduated', 'graduation_seconds')
+
+
+def accuracy(reviews: int, correct: int) -> Optional[float]:
+    """ Percentage of correct answers, None if there were no answers """
+    return round(100 * correct / reviews, 1) if reviews else None
+
+
+def deck_statistics(deck: Deck, days: int = 30) -> Dict:
+    """
+    Gets the statistics of the deck with two queries on its rollups
+
+    Args:
+        deck: Deck to summarize
+        days: Amount of days, today included, of the per day statistics
+
+    Returns:
+        dict: `days` has the reviews and accuracy of each day, oldest first and including days without reviews.
+        `boxes` has the all time reviews and accuracy by box type. `average_days_to_last_box` is how long cards
+        took to reach the last box since their first review, None if no card did
+    """
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    rollups = DailyReviewStats.objects.filter(deck=deck).order_by()
+    totals = {field: Sum(field) for field in TOTALS}
+
+    by_day = {row['day']: row for row in rollups.filter(day__gte=since).values('day').annotate(**totals)}
+    day_stats = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        row = by_day.get(day, {'reviews': 0, 'correct': 0})
+        day_stats.append({'day': day, 'reviews': row['reviews'], 'accuracy': accuracy(row['reviews'], row['correct'])})
+
+    box_stats = list(rollups.values('box_type').annotate(**totals).order_by('box_type'))
+    for row in box_stats:
+        row['accuracy'] = accuracy(row['reviews'], row['correct'])
+
+    graduated = sum(row['graduated'] for row in box_stats)
+    graduation_seconds = sum(row['graduation_seconds'] for row in box_stats)
+    return {
+        'days': day_stats,
+        'boxes': box_stats,
+        'reviews': sum(row['reviews'] for row in box_stats),
+        'accuracy': accuracy(sum(row['reviews'] for row in box_stats), sum(row['correct'] for row in box_stats)),
+        'average_days_to_last_box': round(graduation_seconds / graduated / 86400, 1) if graduated else None,
+    }
@@ -0,0 +1,27 @@
+import pytest
+from django.test import TestCase
+
+from flashcards.leitner.benchmarks.seeding import seed
+from flashcards.leitner.benchmarks.suite import BENCHMARKS, run_suite
+from flashcards.leitner.models import Card, Deck
+
+pytestmark = pytest.mark.django_db
+
+
+class TestLeitnerBenchmarks(TestCase):
+
+    def test_seed(self):
+        decks = seed(users=2, decks=2, cards=3)
+
+        self.assertEqual(len(decks), 4)
+        self.assertEqual(Card.objects.filter(on_deck__in=decks).count(), 12)
+
+    def test_run_suite(self):
+        """ Runs every benchmark once with a tiny database, they shouldn't change the seeded data """
+        results = run_suite(users=1, decks=1, cards=2, runs=2)
+        deck = Deck.objects.get(created_by__username='benchmark0')
+
+        self.assertEqual(set(results), set(BENCHMARKS))
+        self.assertEqual(results['card_correct_answer']['runs'], 2)
+        self.assertEqual(deck.boxes.get(box_type=0).cards.count(), 2)
+        self.assertFalse(deck.session.exists())
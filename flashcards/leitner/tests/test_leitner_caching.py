@@ -0,0 +1,90 @@
+from unittest import mock
+
+import pytest
+from django.test import TestCase
+
+from flashcards.leitner import caching
+from flashcards.leitner.models import Box, Deck, Card, Session
+from flashcards.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+class TestLeitnerCaching(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        self.deck.create_boxes()
+        self.box1 = self.deck.boxes.get(box_type=0)
+
+    def test_deck_list_is_cached(self):
+        caching.deck_list(self.user.pk)
+
+        with self.assertNumQueries(0):
+            decks = caching.deck_list(self.user.pk)
+        self.assertEqual(decks, [{'pk': self.deck.pk, 'description': 'Test deck'}])
+
+    def test_deck_list_is_invalidated(self):
+        caching.deck_list(self.user.pk)
+
+        deck = Deck.objects.create(description='Another deck', created_by=self.user)
+        self.assertEqual(len(caching.deck_list(self.user.pk)), 2)
+        deck.description = 'Renamed'
+        deck.save()
+        self.assertEqual(caching.deck_list(self.user.pk)[1]['description'], 'Renamed')
+        deck.delete()
+        self.assertEqual(len(caching.deck_list(self.user.pk)), 1)
+
+    def test_box_summaries_are_cached(self):
+        caching.box_summaries(self.deck.pk)
+
+        with self.assertNumQueries(0):
+            boxes = caching.box_summaries(self.deck.pk)
+        self.assertEqual([box.card_count for box in boxes], [0, 0, 0])
+        self.assertEqual(boxes[0].last_used_text(), 'Never')
+
+    def test_box_summaries_are_invalidated_by_cards(self):
+        caching.box_summaries(self.deck.pk)
+
+        card = Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box1)
+        self.assertEqual([box.card_count for box in caching.box_summaries(self.deck.pk)], [1, 0, 0])
+        session = Session.start(self.deck, self.box1)
+        card.correct_answer(session)
+        self.assertEqual([box.card_count for box in caching.box_summaries(self.deck.pk)], [0, 1, 0])
+        card.delete()
+        self.assertEqual([box.card_count for box in caching.box_summaries(self.deck.pk)], [0, 0, 0])
+
+    def test_box_summaries_are_invalidated_by_bulk_answers(self):
+        card = Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box1)
+        session = Session.start(self.deck, self.box1)
+        caching.box_summaries(self.deck.pk)
+
+        session.apply_answers([(card.pk, True)])
+
+        self.assertEqual([box.card_count for box in caching.box_summaries(self.deck.pk)], [0, 1, 0])
+
+    def test_deleting_a_deck_does_not_invalidate_per_card(self):
+        def cache_deletes(cards: int) -> int:
+            deck = Deck.objects.create(description='Deleted deck', created_by=self.user)
+            deck.create_boxes()
+            box = deck.boxes.get(box_type=0)
+            Card.objects.bulk_create(Card(front_text='Front', back_text='Back', on_deck=deck, on_box=box)
+                                     for _ in range(cards))
+            with mock.patch.object(caching.cache, 'delete', wraps=caching.cache.delete) as delete:
+                deck.delete()
+            return delete.call_count
+
+        self.assertEqual(cache_deletes(1), cache_deletes(20))
+
+    def test_deck_version_is_read_from_the_database(self):
+        version = caching.deck_version(self.deck.pk)
+        self.assertEqual(caching.deck_version(self.deck.pk, self.user.pk), version)
+        self.assertIsNone(caching.deck_version(self.deck.pk, self.user.pk + 1))
+
+        # Another worker changed the deck, this one never saw an invalidation
+        Box.objects.filter(pk=self.box1.pk).update(in_session=True)
+        changed = caching.deck_version(self.deck.pk)
+        self.assertNotEqual(changed, version)
+        Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box1)
+        self.assertNotEqual(caching.deck_version(self.deck.pk), changed)
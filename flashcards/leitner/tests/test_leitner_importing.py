@@ -0,0 +1,64 @@
+import io
+import tempfile
+
+import pytest
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from flashcards.leitner.importing import CardImportError, import_cards
+from flashcards.leitner.models import Deck, Card
+from flashcards.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+class TestCardImport(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        self.deck.create_boxes()
+
+    def test_import_cards(self):
+        lines = io.StringIO('front,back\nHello,Hola\n\n"Good, morning","Buenos\ndías",2\n')
+
+        imported = import_cards(self.deck, lines)
+
+        self.assertEqual(imported, 2)
+        self.assertEqual(self.deck.boxes.get(box_type=0).cards.get().front_text, 'Hello')
+        self.assertEqual(list(self.deck.boxes.order_by('box_type').values_list('card_count', flat=True)), [1, 0, 1])
+        self.assertEqual(self.deck.boxes.get(box_type=2).cards.get().back_text, 'Buenos\ndías')
+
+    def test_import_cards_in_chunks(self):
+        lines = (f'Front {i}\tBack {i}\n' for i in range(25))
+
+        imported = import_cards(self.deck, lines, delimiter='\t', chunk_size=10)
+
+        self.assertEqual(imported, 25)
+        self.assertEqual(Card.objects.filter(on_deck=self.deck).count(), 25)
+
+    def test_import_cards_rolls_back_on_errors(self):
+        lines = io.StringIO('One,Uno\n' * 20 + 'Two\n,Empty front\nThree,Tres,7\n')
+
+        with self.assertRaises(CardImportError) as cm:
+            import_cards(self.deck, lines, chunk_size=5)
+
+        self.assertEqual([error.line for error in cm.exception.errors], [21, 22, 23])
+        self.assertFalse(Card.objects.filter(on_deck=self.deck).exists())
+
+    def test_import_cards_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv') as file:
+            file.write('One\tUno\nTwo\tDos\t1\n')
+            file.flush()
+            call_command('import_cards', self.deck.pk, file.name, stdout=io.StringIO())
+
+        self.assertEqual(Card.objects.filter(on_deck=self.deck).count(), 2)
+
+    def test_import_cards_command_with_errors(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('One,Uno\nTwo\n')
+            file.flush()
+            with self.assertRaises(CommandError):
+                call_command('import_cards', self.deck.pk, file.name, stderr=io.StringIO())
+
+        self.assertFalse(Card.objects.filter(on_deck=self.deck).exists())
@@ -1,7 +1,14 @@
+import io
+from collections import OrderedDict
+from unittest import mock
+
 import pytest
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from flashcards.leitner.models import Deck, Box, Card, Session
+from flashcards.leitner.models import Deck, Box, BoxLadder, Card, ReviewLog, Session
 from flashcards.users.models import User
 
 pytestmark = pytest.mark.django_db
@@ -22,6 +29,38 @@ class TestLeitnerModelsBasics(TestCase):
         self.assertEqual(str(deck), 'Test deck')
         self.assertEqual(deck.__str__(), 'Test deck')
 
+    def test_box_ladder(self):
+        deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        deck.create_boxes()
+        box1, box2, box3 = deck.boxes.order_by('box_type')
+
+        with self.assertNumQueries(0):
+            ladder = BoxLadder.for_deck(deck.pk)
+        self.assertEqual(ladder.first_box(), box1.pk)
+        self.assertEqual(ladder.next_box(box1.pk), box2.pk)
+        self.assertEqual(ladder.next_box(box3.pk), box3.pk)
+
+    def test_box_ladder_cache_keeps_the_most_recently_used(self):
+        decks = [Deck.objects.create(description=f'Deck {i}', created_by=self.user) for i in range(3)]
+
+        with mock.patch.object(BoxLadder, 'MAX_CACHED', 2), mock.patch.object(BoxLadder, '_cache', OrderedDict()):
+            for deck in decks:
+                deck.create_boxes()
+            BoxLadder.for_deck(decks[1].pk)
+            with self.assertNumQueries(1):
+                BoxLadder.for_deck(decks[0].pk)
+
+            self.assertEqual(list(BoxLadder._cache), [decks[1].pk, decks[0].pk])
+
+    def test_box_ladder_is_invalidated_when_a_box_changes(self):
+        deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        deck.create_boxes()
+        deck.boxes.get(box_type=2).delete()
+
+        with self.assertNumQueries(1):
+            ladder = BoxLadder.for_deck(deck.pk)
+        self.assertEqual(ladder.next_box(deck.boxes.get(box_type=1).pk), deck.boxes.get(box_type=1).pk)
+
     def test_box_str_method(self):
         deck = Deck.objects.create(description='Test deck', created_by=self.user)
         box = Box.objects.create(description='Nothing interesting',
@@ -81,6 +120,63 @@ class TestLeitnerModelsMethods(TestCase):
         self.assertNotEqual(card.on_box, self.box2)
         self.assertNotEqual(card.on_box, self.box3)
 
+    def test_answer_queries(self):
+        """ Answering the current card of a session updates the card, the box counts and the session cursor, and
+        records the review and its daily statistics """
+        card = Card.objects.create(
+            front_text='Sample card', back_text='Sample card',
+            on_deck=self.deck, on_box=self.box1
+        )
+        session = Session.start(self.deck, self.box1)
+        card = session.current_card()
+
+        with CaptureQueriesContext(connection) as queries:
+            card.correct_answer(session)
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        # The card, its box counts, the review, the cursor and an upsert of the statistics of the day. Reaching the
+        # last box adds a query for the first review of the card
+        self.assertEqual([sql.split()[0] for sql in statements], ['UPDATE', 'UPDATE', 'INSERT', 'UPDATE', 'INSERT'])
+        self.assertEqual(card.on_box, self.box2)
+        self.assertIsNone(session.current_card())
+
+    def test_answer_is_atomic(self):
+        card = Card.objects.create(front_text='Sample card', back_text='Sample card', on_deck=self.deck,
+                                   on_box=self.box1)
+        session = Session.start(self.deck, self.box1)
+        card = session.current_card()
+
+        with mock.patch('flashcards.leitner.models.DailyReviewStats.record', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                card.correct_answer(session)
+
+        card.refresh_from_db()
+        session.refresh_from_db()
+        self.assertEqual(card.on_box, self.box1)
+        self.assertEqual(session.cursor, 0)
+        self.assertFalse(ReviewLog.objects.exists())
+        self.assertEqual(list(Box.objects.filter(pk__in=(self.box1.pk, self.box2.pk)).order_by('box_type')
+                              .values_list('card_count', flat=True)), [1, 0])
+
+    def test_answers_are_kept_in_the_review_log(self):
+        cards = [Card.objects.create(front_text=f'Card {i}', back_text='Back', on_deck=self.deck, on_box=self.box2)
+                 for i in range(3)]
+        session = Session.start(self.deck, self.box2)
+        session.current_card().correct_answer(session)
+        session.current_card().wrong_answer(session)
+        session.apply_answers([(cards[2].pk, True)])
+
+        with CaptureQueriesContext(connection) as queries:
+            session.finish()
+        cards[0].delete()
+
+        self.assertFalse([query for query in queries if 'reviewlog' in query['sql']])
+        reviews = list(ReviewLog.objects.order_by('pk').values_list('card', 'user', 'correct', 'from_box', 'to_box'))
+        self.assertEqual(reviews, [
+            (None, self.user.pk, True, 1, 2),
+            (cards[1].pk, self.user.pk, False, 1, 0),
+            (cards[2].pk, self.user.pk, True, 1, 2),
+        ])
+
     def test_session_current_card_on_empty_box(self):
         """ If you run current_card and the box is empty or there are no cards left, none should be returned"""
         session = Session.objects.create(deck=self.deck, current_box=self.box3, total_cards_on_box=4)
@@ -101,3 +197,100 @@ class TestLeitnerModelsMethods(TestCase):
 
         self.assertEqual(session.total_cards_on_box, 4)
         self.assertEqual(session.current_card(), card1)
+
+    def test_session_start_snapshots_the_box(self):
+        """ Cards added after the session started are not part of it, and editing a card keeps its position """
+        card_defaults = {'front_text': 'Front text', 'back_text': 'Back_text', 'on_deck': self.deck,
+                         'on_box': self.box1}
+        card1 = Card.objects.create(**card_defaults)
+        card2 = Card.objects.create(**card_defaults)
+
+        session = Session.start(self.deck, self.box1)
+        Card.objects.create(**card_defaults)
+        card1.front_text = 'Edited'
+        card1.save()
+
+        self.assertEqual(session.total_cards_on_box, 2)
+        self.assertEqual(session.queued_card_ids(), [card1.pk, card2.pk])
+        self.assertEqual(session.current_card(), card1)
+
+    def test_session_current_card_advances_after_answer(self):
+        card_defaults = {'front_text': 'Front text', 'back_text': 'Back_text', 'on_deck': self.deck,
+                         'on_box': self.box1}
+        card1 = Card.objects.create(**card_defaults)
+        card2 = Card.objects.create(**card_defaults)
+        session = Session.start(self.deck, self.box1)
+
+        card1.correct_answer()
+        session.refresh_from_db()
+        self.assertEqual(session.current_card(), card2)
+
+        card2.wrong_answer()
+        session.refresh_from_db()
+        self.assertIsNone(session.current_card())
+
+    def test_session_current_card_skips_deleted_cards(self):
+        card_defaults = {'front_text': 'Front text', 'back_text': 'Back_text', 'on_deck': self.deck,
+                         'on_box': self.box1}
+        card1 = Card.objects.create(**card_defaults)
+        card2 = Card.objects.create(**card_defaults)
+        session = Session.start(self.deck, self.box1)
+
+        card1.delete()
+
+        self.assertEqual(session.current_card(), card2)
+        session.refresh_from_db()
+        self.assertEqual(session.cursor, 1)
+
+
+class TestBoxCardCounts(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.cl', 'testing321')
+        self.deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        self.deck.create_boxes()
+        self.box1 = self.deck.boxes.get(box_type=0)
+        self.box2 = self.deck.boxes.get(box_type=1)
+
+    def card_counts(self):
+        return list(self.deck.boxes.order_by('box_type').values_list('card_count', flat=True))
+
+    def test_card_count_on_create_and_delete(self):
+        card = Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box1)
+        Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box2)
+        self.assertEqual(self.card_counts(), [1, 1, 0])
+
+        card.front_text = 'Edited'
+        card.save()
+        self.assertEqual(self.card_counts(), [1, 1, 0])
+
+        card.delete()
+        self.assertEqual(self.card_counts(), [0, 1, 0])
+
+    def test_card_count_on_answers(self):
+        card1 = Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box1)
+        card2 = Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box2)
+        Session.start(self.deck, self.box1)
+
+        card1.correct_answer()
+        self.assertEqual(self.card_counts(), [0, 2, 0])
+        card2.wrong_answer()
+        self.assertEqual(self.card_counts(), [1, 1, 0])
+
+    def test_card_count_on_bulk_answers(self):
+        cards = [Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box2)
+                 for _ in range(3)]
+        session = Session.start(self.deck, self.box2)
+
+        session.apply_answers([(cards[0].pk, True), (cards[1].pk, False), (cards[2].pk, True)])
+
+        self.assertEqual(self.card_counts(), [1, 0, 2])
+
+    def test_recount_cards(self):
+        Card.objects.bulk_create(
+            Card(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.box2) for _ in range(4))
+        self.assertEqual(self.card_counts(), [0, 0, 0])
+
+        call_command('recount_boxes', deck=self.deck.pk, stdout=io.StringIO())
+
+        self.assertEqual(self.card_counts(), [0, 4, 0])
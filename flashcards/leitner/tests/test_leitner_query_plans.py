@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+
+from flashcards.leitner.models import Deck, Box, Card, ReviewLog, Session
+from flashcards.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+# Plan fragments that mean a table is read entirely or the rows are sorted after reading them
+BAD_PLAN_FRAGMENTS = {
+    'sqlite': ('SCAN ', 'USE TEMP B-TREE'),
+    'postgresql': ('Seq Scan', 'Sort'),
+}
+
+
+class TestLeitnerQueryPlans(TestCase):
+    """ Runs EXPLAIN on the queries used while studying, they should be resolved with indexes only """
+
+    @classmethod
+    def setUpTestData(cls):
+        if connection.vendor not in BAD_PLAN_FRAGMENTS:
+            return
+        user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        for i in range(20):
+            deck = Deck.objects.create(description=f'Deck {i}', created_by=user)
+            deck.create_boxes()
+            Card.objects.bulk_create(
+                Card(front_text=f'Card {j}', back_text=f'Card {j}', on_deck=deck, on_box=box)
+                for box in deck.boxes.all() for j in range(50)
+            )
+            Session.start(deck, deck.boxes.get(box_type=1))
+        cls.deck = Deck.objects.create(description='Studied deck', created_by=user)
+        cls.deck.create_boxes()
+        cls.box = cls.deck.boxes.get(box_type=0)
+        Card.objects.bulk_create(
+            Card(front_text=f'Card {j}', back_text=f'Card {j}', on_deck=cls.deck, on_box=cls.box) for j in range(100)
+        )
+        cls.session = Session.start(cls.deck, cls.box)
+        ReviewLog.objects.bulk_create(
+            ReviewLog(card=card, deck=card.on_deck, user=user, correct=True, from_box=0, to_box=1,
+                      reviewed_at=timezone.now() - timedelta(days=i % 30))
+            for i, card in enumerate(Card.objects.select_related('on_deck'))
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self) -> None:
+        if connection.vendor not in BAD_PLAN_FRAGMENTS:
+            self.skipTest(f'Query plans are not checked on {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            # Tiny tables are always cheaper to scan, so this only allows scans when there is no usable index
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+
+    def assertUsesIndexes(self, qs: QuerySet):
+        plan = qs.explain()
+        for fragment in BAD_PLAN_FRAGMENTS[connection.vendor]:
+            self.assertNotIn(fragment, plan, f'Query plan has "{fragment}":\n{plan}\n{qs.query}')
+
+    def test_session_queue_query(self):
+        """ Session.start: cards of a box in study order """
+        self.assertUsesIndexes(self.box.cards.order_by('updated_at').values_list('pk', flat=True))
+
+    def test_session_current_card_query(self):
+        card = self.box.cards.first()
+        self.assertUsesIndexes(Card.objects.filter(pk=card.pk, on_box=self.box))
+
+    def test_deck_review_history_query(self):
+        since = timezone.now() - timedelta(days=7)
+        self.assertUsesIndexes(ReviewLog.objects.filter(deck=self.deck, reviewed_at__gte=since).order_by('reviewed_at'))
+
+    def test_box_ladder_query(self):
+        self.assertUsesIndexes(Box.objects.filter(deck=self.deck).values_list('box_type', 'pk'))
+
+    def test_deck_session_query(self):
+        self.assertUsesIndexes(Session.objects.filter(deck=self.deck))
+
+    def test_due_cards_query(self):
+        """ Card.due: due cards of a deck by due date, a range scan """
+        self.assertUsesIndexes(Card.due(self.deck).values_list('pk', flat=True))
@@ -0,0 +1,270 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from flashcards.leitner.models import Deck, Card, Session
+from flashcards.leitner.scheduling import due_boxes, due_since, reschedule_deck
+from flashcards.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def local(*args) -> datetime:
+    return timezone.make_aware(datetime(*args))
+
+
+class TestLeitnerScheduling(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        self.deck.create_boxes()
+        self.boxes = list(self.deck.boxes.order_by('box_type'))
+        for box in self.boxes:
+            Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=box)
+        # Wednesday
+        self.now = local(2020, 7, 15, 18, 30)
+
+    def test_due_since(self):
+        self.assertEqual(due_since(0, self.now), local(2020, 7, 15))
+        self.assertEqual(due_since(1, self.now), local(2020, 7, 14))
+        self.assertEqual(due_since(2, self.now), local(2020, 7, 10))
+        self.assertIsNone(due_since(3, self.now))
+
+    def test_due_boxes_never_used(self):
+        boxes = list(due_boxes(self.user, self.now))
+
+        self.assertEqual(boxes, [self.boxes[2], self.boxes[1], self.boxes[0]])
+        self.assertEqual(boxes[0].due_since, local(2020, 7, 10))
+
+    def test_due_boxes_used_after_their_day(self):
+        self.boxes[0].last_used = local(2020, 7, 15, 9)
+        self.boxes[1].last_used = local(2020, 7, 13, 9)
+        self.boxes[2].last_used = local(2020, 7, 10, 9)
+        for box in self.boxes:
+            box.save()
+
+        self.assertEqual(list(due_boxes(self.user, self.now)), [self.boxes[1]])
+
+    def test_due_boxes_skip_empty_boxes_sessions_and_other_users(self):
+        self.boxes[0].cards.get().delete()
+        self.boxes[1].in_session = True
+        self.boxes[1].save()
+        another_user = User.objects.create_user('anotheruser', 'b@b.com', 'testing321')
+        Deck.objects.create(description='Another deck', created_by=another_user).create_boxes()
+
+        self.assertEqual(list(due_boxes(self.user, self.now)), [self.boxes[2]])
+
+    def test_due_boxes_is_a_single_query(self):
+        for i in range(5):
+            deck = Deck.objects.create(description=f'Deck {i}', created_by=self.user)
+            deck.create_boxes()
+            Card.objects.create(front_text='Front', back_text='Back', on_deck=deck, on_box=deck.boxes.get(box_type=0))
+
+        with self.assertNumQueries(1):
+            boxes = list(due_boxes(self.user, self.now))
+            decks = {box.deck.description for box in boxes}
+        self.assertEqual(len(decks), 6)
+
+    def test_study_today_view(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('leitner:study-today'))
+
+        self.assertContains(response, '3 cards to study in 3 boxes')
+
+
+class TestMultiDeckSessions(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.client.force_login(self.user)
+        self.decks = []
+        for i in range(3):
+            deck = Deck.objects.create(description=f'Deck {i}', created_by=self.user)
+            deck.create_boxes()
+            for j in range(2):
+                Card.objects.create(front_text=f'Deck {i} card {j}', back_text='Back', on_deck=deck,
+                                    on_box=deck.boxes.get(box_type=0))
+            self.decks.append(deck)
+
+    def test_start_multi_deck_interleaves_boxes_due_at_the_same_time(self):
+        # The friday box is due since before the every day boxes
+        friday_card = Card.objects.create(front_text='Friday card', back_text='Back', on_deck=self.decks[2],
+                                          on_box=self.decks[2].boxes.get(box_type=2))
+        boxes = list(due_boxes(self.user))
+
+        with CaptureQueriesContext(connection) as queries:
+            session = Session.start_multi_deck(self.user, boxes)
+
+        card_ids = session.queued_card_ids()
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 4)
+        self.assertEqual(len(card_ids), 7)
+        decks = list(Card.objects.filter(pk__in=card_ids).values_list('pk', 'on_deck'))
+        deck_order = [dict(decks)[pk] for pk in card_ids[1:]]
+        self.assertEqual(card_ids[0], friday_card.pk)
+        self.assertEqual(deck_order, [deck.pk for deck in self.decks] * 2)
+        self.assertEqual(set(session.boxes.all()), set(boxes))
+        self.assertFalse(list(due_boxes(self.user)))
+
+    def test_multi_deck_session_flow(self):
+        start_url = reverse('leitner:today-session')
+        cards_url = reverse('leitner:today-session-cards')
+        finished_url = reverse('leitner:today-session-finished')
+
+        self.assertRedirects(self.client.post(start_url), cards_url)
+        self.assertEqual(self.client.post(start_url).status_code, 403)
+        for _ in range(6):
+            self.assertEqual(self.client.get(cards_url).status_code, 200)
+            self.client.post(cards_url, {'_correct': 'Yes'})
+        self.assertRedirects(self.client.get(cards_url), finished_url)
+        self.assertRedirects(self.client.post(finished_url), reverse('leitner:study-today'))
+
+        self.assertFalse(Session.objects.exists())
+        for deck in self.decks:
+            first_box, second_box = deck.boxes.get(box_type=0), deck.boxes.get(box_type=1)
+            self.assertFalse(first_box.in_session)
+            self.assertIsNotNone(first_box.last_used)
+            self.assertEqual(second_box.card_count, 2)
+
+    def test_deck_session_can_not_use_a_box_in_a_multi_deck_session(self):
+        Session.start_multi_deck(self.user, list(due_boxes(self.user)))
+        deck = self.decks[0]
+
+        self.client.post(reverse('leitner:session', args=(deck.pk,)),
+                         {'current_box': deck.boxes.get(box_type=0).pk})
+
+        self.assertFalse(deck.session.exists())
+
+
+class TestCardScheduling(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.client.force_login(self.user)
+        self.deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        self.deck.create_boxes()
+        self.boxes = list(self.deck.boxes.order_by('box_type'))
+        self.now = local(2020, 7, 15, 18, 30)
+
+    def test_schedule_follows_sm2(self):
+        card = Card(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.boxes[0])
+
+        intervals = []
+        for correct in (True, True, True, False, True):
+            card.schedule(correct, self.now)
+            intervals.append(card.interval)
+
+        self.assertEqual(intervals, [1, 6, 15, 1, 6])
+        self.assertAlmostEqual(card.ease, 2.18)
+        self.assertEqual(card.due_at, self.now + timedelta(days=6))
+
+    def test_ease_has_a_minimum(self):
+        card = Card(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.boxes[0])
+
+        for _ in range(10):
+            card.schedule(False, self.now)
+
+        self.assertEqual(card.ease, Card.MIN_EASE)
+
+    def test_answers_schedule_cards_on_the_last_box(self):
+        card = Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.boxes[2])
+        session = Session.start(self.deck, self.boxes[2])
+
+        card.correct_answer(session)
+
+        card.refresh_from_db()
+        self.assertEqual((card.on_box, card.interval), (self.boxes[2], 1))
+        self.assertGreater(card.due_at, timezone.now())
+        self.assertEqual(self.boxes[2].cards.count(), 1)
+
+    def test_due(self):
+        due = Card.objects.create(front_text='Due', back_text='Back', on_deck=self.deck, on_box=self.boxes[0],
+                                  due_at=self.now - timedelta(days=1))
+        Card.objects.create(front_text='Not due', back_text='Back', on_deck=self.deck, on_box=self.boxes[0],
+                            due_at=self.now + timedelta(days=1))
+
+        self.assertEqual(list(Card.due(self.deck, self.now)), [due])
+
+    def test_reschedule_deck(self):
+        for box in self.boxes:
+            for _ in range(3):
+                Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=box)
+        answered = self.boxes[0].cards.first()
+        Card.objects.filter(pk=answered.pk).update(interval=15)
+
+        with CaptureQueriesContext(connection) as queries:
+            rescheduled = reschedule_deck(self.deck)
+
+        self.assertEqual(rescheduled, 9)
+        self.assertEqual(len(queries), 1)
+        for card in Card.objects.all():
+            expected = 15 if card == answered else {0: 1, 1: 3, 2: 7}[card.on_box.box_type]
+            self.assertEqual(card.interval, expected)
+            self.assertEqual(card.due_at, card.updated_at + timedelta(days=expected))
+
+    def test_due_cards_session_flow(self):
+        cards = [Card.objects.create(front_text=f'Card {i}', back_text='Back', on_deck=self.deck, on_box=box)
+                 for i, box in enumerate(self.boxes)]
+        start_url = reverse('leitner:session', args=(self.deck.pk,))
+
+        self.client.post(reverse('leitner:deck-scheduling', args=(self.deck.pk,)))
+        self.deck.refresh_from_db()
+        self.assertTrue(self.deck.card_scheduling)
+        # Switching reschedules the cards from their boxes, make all but one due now
+        Card.objects.update(due_at=timezone.now())
+        Card.objects.filter(pk=cards[1].pk).update(due_at=timezone.now() + timedelta(days=1))
+        self.assertContains(self.client.get(start_url), 'Study the 2 due cards')
+        self.client.post(start_url, {'_due_cards': 'Yes'})
+
+        session = self.deck.session.get()
+        self.assertIsNone(session.current_box)
+        self.assertEqual(session.queued_card_ids(), [cards[0].pk, cards[2].pk])
+        response = self.client.post(reverse('leitner:session-answers', args=(self.deck.pk,)),
+                                    json.dumps({'answers': [{'card': cards[0].pk, 'correct': True},
+                                                            {'card': cards[2].pk, 'correct': False}]}),
+                                    content_type='application/json')
+        self.assertEqual(response.json(), {'answered': 2, 'is_finished': True})
+        self.client.post(reverse('leitner:session-finished', args=(self.deck.pk,)))
+
+        self.assertFalse(Session.objects.exists())
+        self.assertFalse(Card.due(self.deck).exists())
+        self.assertEqual([box.card_count for box in self.deck.boxes.order_by('box_type')], [1, 2, 0])
+
+    def test_due_cards_session_uses_boxes_not_in_another_session(self):
+        cards = [Card.objects.create(front_text=f'Card {i}', back_text='Back', on_deck=self.deck, on_box=box,
+                                     due_at=self.now - timedelta(hours=3 - i)) for i, box in enumerate(self.boxes)]
+        self.boxes[2].in_session = True
+        self.boxes[2].save()
+
+        session = Session.start_due(self.deck, self.now)
+
+        self.assertEqual(session.queued_card_ids(), [cards[0].pk, cards[1].pk])
+        self.assertEqual([box.in_session for box in self.deck.boxes.order_by('box_type')], [True, True, True])
+        session.finish()
+        self.assertEqual([box.in_session for box in self.deck.boxes.order_by('box_type')], [False, False, True])
+
+    def test_due_cards_session_without_due_cards(self):
+        self.client.post(reverse('leitner:deck-scheduling', args=(self.deck.pk,)))
+        Card.objects.update(due_at=timezone.now() + timedelta(days=1))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('leitner:session', args=(self.deck.pk,)), {'_due_cards': 'Yes'})
+
+        self.assertRedirects(response, reverse('leitner:session', args=(self.deck.pk,)))
+        self.assertFalse(self.deck.session.exists())
+        self.assertFalse([query for query in queries if Session._meta.db_table in query['sql']
+                          and not query['sql'].startswith('SELECT')])
+
+    def test_due_cards_session_needs_card_scheduling(self):
+        Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck, on_box=self.boxes[0])
+
+        self.client.post(reverse('leitner:session', args=(self.deck.pk,)), {'_due_cards': 'Yes'})
+
+        self.assertFalse(self.deck.session.exists())
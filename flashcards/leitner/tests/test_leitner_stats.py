@@ -0,0 +1,89 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from flashcards.leitner.models import Card, DailyReviewStats, Deck, ReviewLog, Session
+from flashcards.leitner.stats import deck_statistics
+from flashcards.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+class TestLeitnerStats(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.client.force_login(self.user)
+        self.deck = Deck.objects.create(description='Test deck', created_by=self.user)
+        self.deck.create_boxes()
+        self.boxes = list(self.deck.boxes.order_by('box_type'))
+        self.cards = [Card.objects.create(front_text=f'Card {i}', back_text='Back', on_deck=self.deck,
+                                          on_box=self.boxes[1]) for i in range(4)]
+
+    def study(self):
+        """ Answers the cards on the second box: the first two right, one with the batch endpoint """
+        session = Session.start(self.deck, self.boxes[1])
+        session.current_card().correct_answer(session)
+        session.current_card().wrong_answer(session)
+        session.apply_answers([(self.cards[2].pk, True), (self.cards[3].pk, False)])
+        session.finish()
+
+    def test_answers_update_the_daily_rollup(self):
+        self.study()
+
+        stats = DailyReviewStats.objects.get()
+        self.assertEqual((stats.box_type, stats.day), (1, timezone.localdate()))
+        self.assertEqual((stats.reviews, stats.correct, stats.graduated), (4, 2, 2))
+
+    def test_graduation_time_is_counted_from_the_first_review(self):
+        ReviewLog.objects.create(card=self.cards[0], deck=self.deck, user=self.user, correct=True, from_box=0,
+                                 to_box=1, reviewed_at=timezone.now() - timedelta(days=3))
+
+        self.study()
+
+        stats = DailyReviewStats.objects.get(box_type=1)
+        self.assertAlmostEqual(stats.graduation_seconds / 86400, 3, places=2)
+
+    def test_deck_statistics(self):
+        self.study()
+        DailyReviewStats.objects.create(deck=self.deck, box_type=0, day=timezone.localdate() - timedelta(days=2),
+                                        reviews=10, correct=9)
+
+        with self.assertNumQueries(2):
+            stats = deck_statistics(self.deck, days=7)
+
+        self.assertEqual((stats['reviews'], stats['accuracy']), (14, 78.6))
+        self.assertEqual([day['reviews'] for day in stats['days']], [0, 0, 0, 0, 10, 0, 4])
+        self.assertEqual([day['accuracy'] for day in stats['days']][-3:], [90.0, None, 50.0])
+        self.assertEqual([(box['box_type'], box['accuracy']) for box in stats['boxes']], [(0, 90.0), (1, 50.0)])
+        self.assertEqual(stats['average_days_to_last_box'], 0)
+
+    def test_deck_stats_view(self):
+        self.study()
+
+        response = self.client.get(reverse('leitner:deck-stats', args=(self.deck.pk,)))
+
+        self.assertContains(response, '4 answers, 50.0% correct')
+
+    def test_deck_stats_view_of_another_user(self):
+        another_user = User.objects.create_user('anotheruser', 'b@b.com', 'testing321')
+        deck = Deck.objects.create(description='Another deck', created_by=another_user)
+
+        response = self.client.get(reverse('leitner:deck-stats', args=(deck.pk,)))
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_rebuild_review_stats(self):
+        self.study()
+        expected = list(DailyReviewStats.objects.values_list('box_type', 'reviews', 'correct', 'graduated'))
+        DailyReviewStats.objects.update(reviews=0, correct=0, graduated=0)
+
+        call_command('rebuild_review_stats', stdout=io.StringIO())
+
+        self.assertEqual(list(DailyReviewStats.objects.values_list('box_type', 'reviews', 'correct', 'graduated')),
+                         expected)
@@ -1,7 +1,16 @@
+import asyncio
+import json
+from unittest import mock
+
 import pytest
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import AsyncClient, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from flashcards.leitner import caching
 from flashcards.leitner.models import Deck, Box, Card, Session
 from flashcards.users.models import User
 
@@ -57,6 +66,82 @@ class TestDeckRelatedViews(TestCase):
 
         self.assertEqual(response.status_code, 200)
 
+    def test_deck_detail_view_query_count_does_not_depend_on_cards(self):
+        """ Asserts the deck page costs the same amount of queries with few or many cards """
+        deck = Deck.objects.create(description='blah', created_by=self.user)
+        deck.create_boxes()
+        box = deck.boxes.get(box_type=0)
+        url = reverse('leitner:deck-detail', args=(deck.pk,))
+        self.client.force_login(self.user)
+
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url)
+            return len(queries)
+
+        Card.objects.create(front_text='Front', back_text='Back', on_deck=deck, on_box=box)
+        few_cards_queries = count_queries()
+        Card.objects.bulk_create(
+            Card(front_text=f'Front {i}', back_text='Back', on_deck=deck, on_box=box) for i in range(120))
+        # bulk_create doesn't send signals
+        caching.invalidate_box_summaries(deck.pk)
+        response = self.client.get(url)
+
+        self.assertEqual(few_cards_queries, count_queries())
+        self.assertEqual(len(response.context['boxes'][0].first_page), 50)
+        self.assertContains(response, reverse('leitner:box-cards', args=(deck.pk, box.pk)))
+
+    def test_deck_detail_view_caches_the_boxes_until_the_deck_changes(self):
+        deck = Deck.objects.create(description='blah', created_by=self.user)
+        box = Box.objects.create(description='Box', deck=deck, box_type=0)
+        Card.objects.bulk_create(
+            Card(front_text=f'Front {i}', back_text='Back', on_deck=deck, on_box=box) for i in range(120))
+        url = reverse('leitner:deck-detail', args=(deck.pk,))
+        self.client.force_login(self.user)
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        card = box.cards.get(front_text='Front 0')
+        card.front_text = 'Updated card'
+        card.save()
+
+        self.assertContains(response, 'Front 0')
+        # Only the version of the deck reads the cards, the last change of each box
+        self.assertFalse([query for query in queries if 'front_text' in query['sql']])
+        self.assertContains(self.client.get(url), 'Updated card')
+
+    def test_deck_list_view_caches_the_decks_until_they_change(self):
+        url = reverse('leitner:deck-list')
+        self.client.force_login(self.user)
+        Deck.objects.create(description='First deck', created_by=self.user)
+        self.client.get(url)
+
+        cached = self.client.get(url)
+        Deck.objects.create(description='Second deck', created_by=self.user)
+
+        self.assertContains(cached, 'First deck')
+        self.assertContains(self.client.get(url), 'Second deck')
+
+    def test_box_card_list_view_pagination(self):
+        """ Asserts the pages of a box don't repeat or skip cards """
+        deck = Deck.objects.create(description='blah', created_by=self.user)
+        box = Box.objects.create(description='Box', deck=deck, box_type=0)
+        Card.objects.bulk_create(
+            Card(front_text=f'Front {i}', back_text='Back', on_deck=deck, on_box=box) for i in range(150))
+        url = reverse('leitner:box-cards', args=(deck.pk, box.pk))
+        self.client.force_login(self.user)
+
+        first_page = self.client.get(url).context
+        second_page = self.client.get(url, {'after': first_page['next_after']}).context
+
+        self.assertEqual(len(first_page['cards']), 100)
+        self.assertEqual(len(second_page['cards']), 50)
+        self.assertIsNone(second_page['next_after'])
+        self.assertEqual({card.pk for card in first_page['cards'] + second_page['cards']},
+                         set(box.cards.values_list('pk', flat=True)))
+
     def test_deck_delete_view_qs(self):
         deck = Deck.objects.create(description='Something not important', created_by=self.user)
         another_user = User.objects.create_user('anotheruser', 'b@b.com', 'testing321')
@@ -108,6 +193,57 @@ class TestCardRelatedViews(TestCase):
 
         self.assertEqual(last_card_before, new_card)
 
+    def test_card_import_view_post(self):
+        """ Asserts the cards of the uploaded file are created """
+        self.deck.create_boxes()
+        url = reverse('leitner:import-cards', args=(self.deck.pk,))
+        upload = SimpleUploadedFile('cards.tsv', 'One\tUno\nTwo\tDos\t2\n'.encode())
+
+        response = self.client.post(url, data={'file': upload})
+
+        self.assertRedirects(response, reverse('leitner:deck-detail', args=(self.deck.pk,)))
+        self.assertEqual(self.deck.cards.count(), 2)
+        self.assertEqual(self.deck.boxes.get(box_type=2).cards.get().front_text, 'Two')
+
+    def test_card_import_view_post_with_invalid_rows(self):
+        """ Asserts no card is created if a row is invalid, and the error is shown """
+        self.deck.create_boxes()
+        url = reverse('leitner:import-cards', args=(self.deck.pk,))
+        upload = SimpleUploadedFile('cards.csv', b'One,Uno\nTwo\n')
+
+        response = self.client.post(url, data={'file': upload})
+
+        self.assertContains(response, 'Line 2: Expected 2 or 3 columns, got 1')
+        self.assertFalse(self.deck.cards.exists())
+
+    def test_deck_export_view(self):
+        """ Asserts the exported CSV can be imported back """
+        self.deck.create_boxes()
+        Card.objects.create(front_text='Hello, world', back_text='Hola\nmundo', on_deck=self.deck,
+                            on_box=self.deck.boxes.get(box_type=1))
+        url = reverse('leitner:deck-export', args=(self.deck.pk,))
+
+        response = self.client.get(url)
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join(response.streaming_content).decode(),
+                         'front,back,box_type\r\n"Hello, world","Hola\nmundo",1\r\n')
+
+    def test_decks_export_view(self):
+        """ Asserts every deck and card of the user is exported as a JSON line """
+        self.deck.create_boxes()
+        Card.objects.create(front_text='Front', back_text='Back', on_deck=self.deck,
+                            on_box=self.deck.boxes.get(box_type=0))
+        another_user = User.objects.create_user('anotheruser', 'b@b.com', 'testing321')
+        Deck.objects.create(description='Not exported', created_by=another_user)
+
+        response = self.client.get(reverse('leitner:decks-export'))
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual([line['type'] for line in lines], ['deck', 'card'])
+        self.assertEqual(lines[0]['description'], 'Nothing important')
+        self.assertEqual(lines[1]['front_text'], 'Front')
+
     def test_card_update_view_get(self):
         """ Asserts the get method works correctly """
         box = Box.objects.create(description='...', deck=self.deck, box_type=0)
@@ -297,6 +433,20 @@ class TestSessionRelatedViews(TestCase):
 
         self.assertEqual(card.on_box, self.box3)
 
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+                       MESSAGE_STORAGE='django.contrib.messages.storage.cookie.CookieStorage')
+    def test_session_cards_view_answer_with_cookie_sessions(self):
+        """ With sessions and messages in cookies, studying doesn't touch the session table """
+        client = Client()
+        client.force_login(self.user)
+        Session.start(self.deck, self.box1)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(self.study_session_url, {'_correct': 'Yes'}, follow=True)
+
+        self.assertContains(response, 'Got it!')
+        self.assertFalse([query for query in queries.captured_queries if 'django_session' in query['sql']])
+
     def test_session_cards_view_with_incorrect_answer_post(self):
         """ Asserts the card is correctly moved after an incorrect answer """
         data = {'_incorrect': 'No'}
@@ -326,6 +476,70 @@ class TestSessionRelatedViews(TestCase):
         self.assertRaises(Session.DoesNotExist, session.refresh_from_db)
         self.assertFalse(self.box1.in_session)
 
+    def test_session_answers_view_moves_cards(self):
+        """ Asserts a batch of answers moves every card and advances the session """
+        session = Session.start(self.deck, self.box1)
+        card_ids = session.queued_card_ids()
+        url = reverse('leitner:session-answers', args=(self.deck.pk,))
+        data = {'answers': [{'card': card_ids[0], 'correct': True}, {'card': card_ids[1], 'correct': False}]}
+
+        response = self.client.post(url, data=data, content_type='application/json')
+        session.refresh_from_db()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'answered': 2, 'is_finished': False})
+        self.assertEqual(Card.objects.get(pk=card_ids[0]).on_box, self.box2)
+        self.assertEqual(Card.objects.get(pk=card_ids[1]).on_box, self.box1)
+        self.assertEqual(session.current_card().pk, card_ids[2])
+
+    def test_session_answers_view_query_count_does_not_depend_on_batch_size(self):
+        """ Asserts answering 2 or 8 cards at once costs the same amount of queries """
+        session = Session.start(self.deck, self.box1)
+        card_ids = session.queued_card_ids()
+        url = reverse('leitner:session-answers', args=(self.deck.pk,))
+
+        def answer(ids):
+            data = {'answers': [{'card': pk, 'correct': True} for pk in ids]}
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(url, data=data, content_type='application/json')
+            return len(queries)
+
+        # The first answer of the day also creates the statistics row
+        answer(card_ids[:1])
+        self.assertEqual(answer(card_ids[1:3]), answer(card_ids[3:]))
+        session.refresh_from_db()
+        self.assertTrue(session.is_finished)
+        self.assertEqual(self.box2.cards.count(), 10)
+
+    def test_session_answers_view_with_invalid_cards(self):
+        """ Asserts nothing is applied if a card is not pending in the session """
+        session = Session.start(self.deck, self.box1)
+        card_ids = session.queued_card_ids()
+        url = reverse('leitner:session-answers', args=(self.deck.pk,))
+        data = {'answers': [{'card': card_ids[0], 'correct': True}, {'card': 0, 'correct': True}]}
+
+        response = self.client.post(url, data=data, content_type='application/json')
+        session.refresh_from_db()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.box1.cards.count(), 10)
+        self.assertEqual(session.cursor, 0)
+
+    def test_session_answers_view_only_accepts_booleans(self):
+        """ Asserts answers that aren't true or false are rejected instead of counted as correct """
+        session = Session.start(self.deck, self.box1)
+        card_id = session.queued_card_ids()[0]
+        url = reverse('leitner:session-answers', args=(self.deck.pk,))
+
+        for correct in ('false', '0', 0, 1, [], None):
+            data = {'answers': [{'card': card_id, 'correct': correct}]}
+            response = self.client.post(url, data=data, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        session.refresh_from_db()
+
+        self.assertEqual(self.box1.cards.count(), 10)
+        self.assertEqual(session.cursor, 0)
+
     # POST methods that should return HTTP 403
 
     def test_session_start_view_post_with_existing_session(self):
@@ -364,6 +578,14 @@ class TestSessionRelatedViews(TestCase):
 
         self.assertEqual(response.status_code, 403)
 
+    def test_session_answers_view_with_no_session(self):
+        """ Asserts HTTP 403 after trying to POST answers with no current session"""
+        url = reverse('leitner:session-answers', args=(self.deck.pk,))
+
+        response = self.client.post(url, data={'answers': []}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 403)
+
     def test_session_finished_view_with_no_session(self):
         """ Asserts HTTP 403 after trying to finish an unexisting session """
         url = reverse('leitner:session-finished', args=(self.deck.pk,))
@@ -379,4 +601,81 @@ class TestSessionRelatedViews(TestCase):
 
         response = self.client.post(url)
 
-        self.assertEqual(response.status_code, 403)
\ No newline at end of file
+        self.assertEqual(response.status_code, 403)
+
+class TestAsyncViews(TestCase):
+    """ The study views are async, these requests go through the ASGI handler """
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.deck = Deck.objects.create(description='Async deck', created_by=self.user)
+        self.deck.create_boxes()
+        self.box = self.deck.boxes.get(box_type=0)
+        self.cards = [Card.objects.create(front_text=f'Front {i}', back_text='Back', on_deck=self.deck, on_box=self.box)
+                      for i in range(2)]
+        Session.start(self.deck, self.box)
+        self.async_client.force_login(self.user)
+
+    async def test_login_required(self):
+        response = await AsyncClient().get(reverse('leitner:deck-list'))
+
+        self.assertRedirects(response, f"{reverse('users:login')}?next={reverse('leitner:deck-list')}",
+                             fetch_redirect_response=False)
+
+    async def test_deck_export_is_streamed_in_chunks(self):
+        with mock.patch('flashcards.leitner.exporting.CHUNK_SIZE', 2):
+            response = await self.async_client.get(reverse('leitner:deck-export', args=(self.deck.pk,)))
+            parts = [part async for part in response.streaming_content]
+
+        # The header and the two cards, read a chunk at a time instead of buffered whole
+        self.assertTrue(response.is_async)
+        self.assertEqual(parts, [b'front,back,box_type\r\nFront 0,Back,0\r\n', b'Front 1,Back,0\r\n'])
+
+    async def test_deck_list(self):
+        response = await self.async_client.post(reverse('leitner:deck-list'), {'description': 'Another deck'})
+        self.assertRedirects(response, reverse('leitner:deck-list'), fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('leitner:deck-list'))
+
+        self.assertContains(response, 'Another deck')
+        self.assertEqual(await Box.objects.filter(deck__description='Another deck').acount(), 3)
+
+    async def test_forms_and_messages_are_handled_out_of_the_event_loop(self):
+        on_event_loop = []
+
+        def success(*args, **kwargs):
+            try:
+                on_event_loop.append(asyncio.get_running_loop() is not None)
+            except RuntimeError:
+                on_event_loop.append(False)
+
+        with mock.patch('flashcards.leitner.views.messages.success', side_effect=success):
+            await self.async_client.post(reverse('leitner:deck-list'), {'description': 'Another deck'})
+            await self.async_client.post(reverse('leitner:session-cards', args=(self.deck.pk,)), {'_correct': 'Yes'})
+
+        self.assertEqual(on_event_loop, [False, False])
+
+    async def test_deck_detail_revalidation(self):
+        url = reverse('leitner:deck-detail', args=(self.deck.pk,))
+
+        # The first page sets the CSRF cookie, which is part of the ETag
+        await self.async_client.get(url)
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'Front 0')
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((await self.async_client.get(reverse('leitner:deck-detail', args=(0,)))).status_code, 404)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    async def test_session_cards(self):
+        url = reverse('leitner:session-cards', args=(self.deck.pk,))
+
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'Front 0')
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+        response = await self.async_client.post(url, {'_correct': 'Yes'})
+
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual((await Card.objects.aget(pk=self.cards[0].pk)).on_box_id,
+                         (await self.deck.boxes.aget(box_type=1)).pk)
+        self.assertContains(await self.async_client.get(url), 'Front 1')
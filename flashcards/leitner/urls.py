@@ -6,12 +6,23 @@ app_name = 'leitner'
 
 urlpatterns = [
     path('', views.DeckListView.as_view(), name='deck-list'),
+    path('today', views.StudyTodayView.as_view(), name='study-today'),
+    path('today/session', views.MultiDeckSessionStartView.as_view(), name='today-session'),
+    path('today/session/cards', views.SessionCardsView.as_view(), name='today-session-cards'),
+    path('today/session/finished', views.SessionFinishedView.as_view(), name='today-session-finished'),
+    path('export.jsonl', views.DecksExportView.as_view(), name='decks-export'),
     path('<int:deck_pk>/', views.DeckDetailView.as_view(), name='deck-detail'),
+    path('<int:deck_pk>/stats', views.DeckStatsView.as_view(), name='deck-stats'),
+    path('<int:deck_pk>/export.csv', views.DeckExportView.as_view(), name='deck-export'),
     path('<int:pk>/delete', views.DeckDeleteView.as_view(), name='deck-delete'),
+    path('<int:deck_pk>/scheduling', views.DeckSchedulingView.as_view(), name='deck-scheduling'),
     path('<int:deck_pk>/session', views.SessionStartView.as_view(), name='session'),
     path('<int:deck_pk>/session/cards', views.SessionCardsView.as_view(), name='session-cards'),
+    path('<int:deck_pk>/session/answers', views.SessionAnswersView.as_view(), name='session-answers'),
     path('<int:deck_pk>/session/finished', views.SessionFinishedView.as_view(), name='session-finished'),
+    path('<int:deck_pk>/boxes/<int:box_pk>', views.BoxCardListView.as_view(), name='box-cards'),
     path('<int:deck_pk>/add_card', views.CardCreationView.as_view(), name='add-card'),
+    path('<int:deck_pk>/import_cards', views.CardImportView.as_view(), name='import-cards'),
     path('<int:deck_pk>/cards/<int:card_pk>', views.CardUpdateView.as_view(), name='card-update'),
     path('<int:deck_pk>/cards/<int:card_pk>/delete', views.CardDeleteView.as_view(), name='card-delete'),
 ]
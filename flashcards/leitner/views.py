@@ -1,28 +1,81 @@
+import io
+import json
+from functools import partial
+from typing import Optional
+
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy
-from django.utils import timezone
 from django.views import View
 from django.views.generic import DeleteView
 
+from flashcards.conditional import PageVersion, conditional_page
+from flashcards.fragments import LazyPage
 from flashcards.leitner.forms import CardCreationForm, DeckCreationForm, CardUpdateForm, \
-    SessionSelectBoxForm
-from flashcards.leitner.models import Deck, Card, Session
+    SessionSelectBoxForm, CardImportForm
+from flashcards.leitner import caching
+from flashcards.leitner.exporting import account_json_lines, deck_csv_lines, streaming_response
+from flashcards.leitner.importing import CardImportError, delimiter_for, import_cards
+from flashcards.leitner.models import Box, Deck, Card, Session
+from flashcards.leitner.scheduling import due_boxes, reschedule_deck
+from flashcards.leitner.stats import deck_statistics
+
+
+def deck_page_version(request, deck_pk: int, **kwargs) -> Optional[PageVersion]:
+    """ Pages of a deck change with the version of the deck """
+    version = caching.deck_version(deck_pk, request.user.pk)
+    return None if version is None else ((version,), None)
+
+
+def card_page_version(request, deck_pk: int, card_pk: int) -> Optional[PageVersion]:
+    updated_at = Card.objects.filter(pk=card_pk, on_deck=deck_pk, on_deck__created_by=request.user).values_list(
+        'updated_at', flat=True).first()
+    return None if updated_at is None else ((updated_at.isoformat(),), updated_at)
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """ Async version of `get_object_or_404`, for a queryset """
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+# Renders in a thread, templates can query the database through lazy objects and tags like the sidebar of notes
+arender = sync_to_async(render)
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """ LoginRequiredMixin for views with async handlers """
 
+    async def dispatch(self, request, *args, **kwargs):
+        # The user is loaded lazily from the session, which can't be done from the event loop
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
 
-class DeckListView(LoginRequiredMixin, View):
+
+class DeckListView(AsyncLoginRequiredMixin, View):
     template_name = "leitner/decklistview.html"
     login_url = reverse_lazy('users:login')
     form_class = DeckCreationForm
 
-    def get(self, request, *args, **kwargs):
-        decks_qs = request.user.decks.all()
+    async def get(self, request, *args, **kwargs):
+        # The version is read first, a fragment is never cached under a version newer than the decks it lists
+        version = await sync_to_async(caching.deck_list_version)(request.user.pk)
+        decks = await sync_to_async(caching.deck_list)(request.user.pk)
         form = self.form_class()
-        return render(request, self.template_name, {'decks': decks_qs, 'form': form})
+        return await arender(request, self.template_name, {'decks': decks, 'form': form, 'version': version})
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
+        # Parsing the form and storing messages block, they run in a thread like the queries
+        await sync_to_async(self.create_deck)(request)
+        return redirect('leitner:deck-list')
+
+    def create_deck(self, request) -> None:
         # This is used to create a box in the same view
         form = self.form_class(request.POST)
         if form.is_valid():
@@ -31,17 +84,82 @@ class DeckListView(LoginRequiredMixin, View):
             messages.success(request, 'Deck created successfully')
         else:
             messages.warning(request, 'Could not create the deck, make sure the field was not empty')
-        return redirect('leitner:deck-list')
 
 
-class DeckDetailView(LoginRequiredMixin, View):
+class StudyTodayView(LoginRequiredMixin, View):
+    """ Lists the due boxes of every deck of the user """
+    template_name = 'leitner/studytodayview.html'
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, *args, **kwargs):
+        boxes = list(due_boxes(request.user))
+        total_cards = sum(box.card_count for box in boxes)
+        in_session = not boxes and Session.objects.filter(user=request.user, deck=None).exists()
+        return render(request, self.template_name,
+                      {'boxes': boxes, 'total_cards': total_cards, 'in_session': in_session})
+
+
+class DeckDetailView(AsyncLoginRequiredMixin, View):
     template_name = 'leitner/deckdetailview.html'
     login_url = reverse_lazy('users:login')
+    cards_per_box = 50
+
+    @conditional_page(deck_page_version)
+    async def get(self, request, *args, **kwargs):
+        deck = await aget_object_or_404(Deck.objects, pk=kwargs['deck_pk'], created_by=request.user)
+        version = await sync_to_async(caching.deck_version)(deck.pk)
+        boxes = await sync_to_async(caching.box_summaries)(deck.pk)
+        for box in boxes:
+            # One query per box when the cached fragment of the boxes is stale, none otherwise
+            box.first_page = LazyPage(partial(box.card_page, size=self.cards_per_box))
+        return await arender(request, self.template_name, {'deck': deck, 'boxes': boxes, 'version': version})
+
+
+class DeckStatsView(LoginRequiredMixin, View):
+    """ Shows the accuracy and throughput of a deck, from its daily rollups """
+    template_name = 'leitner/deckstatsview.html'
+    login_url = reverse_lazy('users:login')
+    days = 30
 
     def get(self, request, *args, **kwargs):
         deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
-        boxes = deck.boxes.order_by('box_type')
-        return render(request, self.template_name, {'deck': deck, 'boxes': boxes})
+        return render(request, self.template_name, {'deck': deck, 'stats': deck_statistics(deck, self.days)})
+
+
+class BoxCardListView(LoginRequiredMixin, View):
+    """ Lists the cards of a box, paginated by card id """
+    template_name = 'leitner/cardlistview.html'
+    login_url = reverse_lazy('users:login')
+    cards_per_page = 100
+
+    @conditional_page(deck_page_version)
+    def get(self, request, *args, **kwargs):
+        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
+        box = get_object_or_404(Box, pk=kwargs['box_pk'], deck=deck)
+        try:
+            after = int(request.GET['after']) if 'after' in request.GET else None
+        except ValueError:
+            return HttpResponseBadRequest()
+        cards, next_after = box.card_page(after=after, size=self.cards_per_page)
+        return render(request, self.template_name,
+                      {'deck': deck, 'box': box, 'cards': cards, 'next_after': next_after})
+
+
+class DeckExportView(LoginRequiredMixin, View):
+    """ Streams the cards of the deck as a CSV file """
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, *args, **kwargs):
+        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
+        return streaming_response(request, deck_csv_lines(deck), 'text/csv', f'deck-{deck.pk}.csv')
+
+
+class DecksExportView(LoginRequiredMixin, View):
+    """ Streams every deck and card of the user as JSON lines """
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, *args, **kwargs):
+        return streaming_response(request, account_json_lines(request.user), 'application/x-ndjson', 'decks.jsonl')
 
 
 class DeckDeleteView(LoginRequiredMixin, DeleteView):
@@ -81,11 +199,39 @@ class CardCreationView(LoginRequiredMixin, View):
             return render(request, self.template_name, {'form': form, 'deck': deck})
 
 
+class CardImportView(LoginRequiredMixin, View):
+    form_class = CardImportForm
+    template_name = "leitner/cardimportview.html"
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, *args, **kwargs):
+        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
+        return render(request, self.template_name, {'form': self.form_class(), 'deck': deck})
+
+    def post(self, request, *args, **kwargs):
+        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
+        form = self.form_class(request.POST, request.FILES)
+        if not form.is_valid():
+            messages.warning(request, 'Could not import the cards, select a file')
+            return render(request, self.template_name, {'form': form, 'deck': deck})
+        upload = form.cleaned_data['file']
+        # The upload is read line by line, so big files don't need to fit in memory
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+        try:
+            imported = import_cards(deck, lines, delimiter_for(upload.name))
+        except CardImportError as e:
+            messages.warning(request, f'{e}, nothing was imported')
+            return render(request, self.template_name, {'form': form, 'deck': deck, 'import_error': e})
+        messages.success(request, f'{imported} cards imported successfully')
+        return redirect('leitner:deck-detail', deck.pk)
+
+
 class CardUpdateView(LoginRequiredMixin, View):
     template_name = "leitner/cardcreationview.html"
     form_class = CardUpdateForm
     login_url = reverse_lazy('users:login')
 
+    @conditional_page(card_page_version)
     def get(self, request, *args, **kwargs):
         deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
         card = get_object_or_404(Card, pk=kwargs['card_pk'], on_deck=deck)
@@ -133,95 +279,189 @@ class SessionStartView(LoginRequiredMixin, View):
 
     def get(self, request, *args, **kwargs):
         deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
-        if deck.session.exists():
-            if deck.session.get().is_finished:
+        if (session := deck.session.first()) is not None:
+            if session.is_finished:
                 return redirect('leitner:session-finished', deck.pk)
             return redirect('leitner:session-cards', deck.pk)
         form = self.form(deck)
-        return render(request, self.template_name, {'form': form, 'deck': deck})
+        due_cards = Card.due(deck).count() if deck.card_scheduling else None
+        return render(request, self.template_name, {'form': form, 'deck': deck, 'due_cards': due_cards})
 
     def post(self, request, *args, **kwargs):
         deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
         if deck.session.exists():
             return HttpResponseForbidden()
+        if '_due_cards' in request.POST and deck.card_scheduling:
+            # A session is only created when there is something to study
+            if due_cards := Session.due_cards(deck):
+                Session.start_due(deck, due_cards=due_cards)
+                messages.success(request, 'Session started!')
+            else:
+                messages.warning(request, 'There are no due cards, come back later')
+            return redirect('leitner:session', deck.pk)
         form = self.form(deck, request.POST)
         if form.is_valid():
             box = form.cleaned_data['current_box']
-            if box.cards.count() == 0:
+            if box.card_count == 0:
                 messages.warning(request, 'The selected box is empty, use another')
                 return redirect('leitner:session', deck.pk)
+            if box.in_session:
+                messages.warning(request, 'The selected box is being studied in another session')
+                return redirect('leitner:session', deck.pk)
             box.in_session = True
             box.save()
-            Session.objects.create(deck=deck, current_box=box,
-                                   total_cards_on_box=box.cards.count(),
-                                   is_finished=False)
+            Session.start(deck, box)
             messages.success(request, 'Session started!')
         else:
             messages.warning(request, 'Could not start session, try again')
         return redirect('leitner:session', deck.pk)
 
 
-class SessionCardsView(LoginRequiredMixin, View):
+class DeckSchedulingView(LoginRequiredMixin, View):
+    """ Switches a deck between studying by box and studying each card by its own due date """
+    login_url = reverse_lazy('users:login')
+
+    def post(self, request, *args, **kwargs):
+        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
+        deck.card_scheduling = not deck.card_scheduling
+        deck.save(update_fields=['card_scheduling'])
+        if deck.card_scheduling:
+            reschedule_deck(deck)
+            messages.success(request, 'The cards of this deck are now studied by their own due date')
+        else:
+            messages.success(request, 'The cards of this deck are now studied by box')
+        return redirect('leitner:deck-detail', deck.pk)
+
+
+class MultiDeckSessionStartView(LoginRequiredMixin, View):
+    """ View to create a study session with every due box of the user """
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, *args, **kwargs):
+        if (session := Session.objects.filter(user=request.user, deck=None).first()) is not None:
+            if session.is_finished:
+                return redirect('leitner:today-session-finished')
+            return redirect('leitner:today-session-cards')
+        return redirect('leitner:study-today')
+
+    def post(self, request, *args, **kwargs):
+        if Session.objects.filter(user=request.user, deck=None).exists():
+            return HttpResponseForbidden()
+        boxes = list(due_boxes(request.user))
+        if not boxes:
+            messages.warning(request, 'Nothing is due today')
+            return redirect('leitner:study-today')
+        Session.start_multi_deck(request.user, boxes)
+        messages.success(request, 'Session started!')
+        return redirect('leitner:today-session-cards')
+
+
+class StudySessionMixin:
+    """
+    Finds the session of the deck in the URL, or the multi-deck session of the user when the URL has no deck,
+    and the pages of its flow
+    """
+    deck = None
+
+    def get_session(self) -> Optional[Session]:
+        if 'deck_pk' in self.kwargs:
+            self.deck = get_object_or_404(Deck, pk=self.kwargs['deck_pk'], created_by=self.request.user)
+            return self.deck.session.first()
+        return Session.objects.filter(user=self.request.user, deck=None).first()
+
+    async def aget_session(self) -> Optional[Session]:
+        """ Async version of `get_session` """
+        if 'deck_pk' in self.kwargs:
+            self.deck = await aget_object_or_404(Deck.objects, pk=self.kwargs['deck_pk'], created_by=self.request.user)
+            return await self.deck.session.afirst()
+        return await Session.objects.filter(user=self.request.user, deck=None).afirst()
+
+    def redirect_to(self, page: str):
+        """ Redirects to the `start`, `cards` or `finished` page of the session, or to where it ends (`done`) """
+        if self.deck is None:
+            return redirect({'start': 'leitner:study-today', 'cards': 'leitner:today-session-cards',
+                             'finished': 'leitner:today-session-finished', 'done': 'leitner:study-today'}[page])
+        return redirect({'start': 'leitner:session', 'cards': 'leitner:session-cards',
+                         'finished': 'leitner:session-finished', 'done': 'leitner:deck-detail'}[page], self.deck.pk)
+
+
+class SessionCardsView(AsyncLoginRequiredMixin, StudySessionMixin, View):
     """ View that shows every card from the selected box """
     template_name = 'leitner/session/study_session.html'
     login_url = reverse_lazy('users:login')
 
-    def get(self, request, *args, **kwargs):
-        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
-        if not deck.session.exists():
-            return redirect('leitner:session', deck.pk)
-        if (session := deck.session.get()).is_finished:
-            return redirect('leitner:session-finished', deck.pk)
-        if (card := session.current_card()) is not None:
-            return render(request, self.template_name, {'card': card, 'deck': deck})
+    async def get(self, request, *args, **kwargs):
+        if (session := await self.aget_session()) is None:
+            return self.redirect_to('start')
+        if session.is_finished:
+            return self.redirect_to('finished')
+        if (card := await sync_to_async(session.current_card)()) is not None:
+            return await arender(request, self.template_name, {'card': card, 'deck': self.deck})
         session.is_finished = True
-        session.save()
-        return redirect('leitner:session-finished', deck.pk)
+        await session.asave()
+        return self.redirect_to('finished')
 
-    def post(self, request, *args, **kwargs):
-        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
-        if not deck.session.exists():
+    async def post(self, request, *args, **kwargs):
+        if (session := await self.aget_session()) is None or session.is_finished:
             return HttpResponseForbidden()
-        elif deck.session.get().is_finished:
+        # Parsing the form, the answer and storing the message block, they run together in a single thread
+        return await sync_to_async(self.answer)(request, session)
+
+    def answer(self, request, session: Session):
+        """ Answers the current card of the session with the submitted button """
+        if (card := session.current_card()) is None:
+            # The cards page finishes the session
+            return self.redirect_to('cards')
+        if '_correct' in request.POST:
+            card.correct_answer(session)
+            messages.success(request, 'Got it! That\'s a correct answer!')
+        elif '_incorrect' in request.POST:
+            card.wrong_answer(session)
+            messages.success(request, 'Dang :( Keep going and you\'ll get it next time!')
+        else:
             return HttpResponseForbidden()
-        session = deck.session.get()
-        if (card := session.current_card()) is not None:
-            if '_correct' in request.POST:
-                card.correct_answer()
-                messages.success(request, 'Got it! That\'s a correct answer!')
-                return redirect('leitner:session-cards', deck.pk)
-            elif '_incorrect' in request.POST:
-                card.wrong_answer()
-                messages.success(request, 'Dang :( Keep going and you\'ll get it next time!')
-                return redirect('leitner:session-cards', deck.pk)
-            else:
-                return HttpResponseForbidden()
+        return self.redirect_to('cards')
 
 
-class SessionFinishedView(LoginRequiredMixin, View):
+class SessionAnswersView(LoginRequiredMixin, View):
+    """ JSON endpoint to answer a batch of cards of the current study session at once """
+    login_url = reverse_lazy('users:login')
+
+    def post(self, request, *args, **kwargs):
+        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
+        session = deck.session.first()
+        if session is None or session.is_finished:
+            return JsonResponse({'error': 'There is no study session in progress'}, status=403)
+        try:
+            answers = [(int(answer['card']), answer['correct']) for answer in json.loads(request.body)['answers']]
+            # Anything else would be truthy, like "false" or "0"
+            if not all(isinstance(correct, bool) for _, correct in answers):
+                raise TypeError('Answers must be true or false')
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'error': 'Expected {"answers": [{"card": <id>, "correct": <bool>}, ...]}'},
+                                status=400)
+        try:
+            answered = session.apply_answers(answers)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'answered': answered, 'is_finished': session.is_finished})
+
+
+class SessionFinishedView(LoginRequiredMixin, StudySessionMixin, View):
     """ View to finish the study session """
     template_name = "leitner/session/finished_session.html"
     login_url = reverse_lazy('users:login')
 
     def get(self, request, *args, **kwargs):
-        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
-        if not deck.session.exists():
-            return redirect('leitner:session', deck.pk)
-        if not deck.session.get().is_finished:
-            return redirect('leitner:session-cards', deck.pk)
-        return render(request, self.template_name, {'session': deck.session.get()})
+        if (session := self.get_session()) is None:
+            return self.redirect_to('start')
+        if not session.is_finished:
+            return self.redirect_to('cards')
+        return render(request, self.template_name, {'session': session})
 
     def post(self, request, *args, **kwargs):
-        deck = get_object_or_404(Deck, pk=kwargs['deck_pk'], created_by=request.user)
-        if not deck.session.exists():
+        if (session := self.get_session()) is None or not session.is_finished:
             return HttpResponseForbidden()
-        elif not deck.session.get().is_finished:
-            return HttpResponseForbidden()
-        session = deck.session.get()
-        box = session.current_box
-        box.last_used = timezone.now()
-        box.in_session = False
-        box.save()
-        session.delete()
+        session.finish()
         messages.success(request, 'Study session finished!')
-        return redirect('leitner:deck-detail', deck.pk)
+        return self.redirect_to('done')
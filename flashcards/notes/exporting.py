@@ -0,0 +1,12 @@
+from typing import Iterator
+
+from flashcards.leitner.exporting import CHUNK_SIZE, json_line
+from flashcards.notes.models import Note
+
+
+def account_json_lines(user) -> Iterator[str]:
+    """ JSON lines with every note of the user, read from the database in chunks """
+    notes = Note.objects.filter(created_by=user).select_related('body').order_by('pk').only(
+        'title', 'content', 'is_large', 'updated_at', 'body__data')
+    for note in notes.iterator(chunk_size=CHUNK_SIZE):
+        yield json_line({'type': 'note', 'title': note.title, 'content': note.text, 'updated_at': note.updated_at})
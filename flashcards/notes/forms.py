@@ -0,0 +1,22 @@
+from django import forms
+
+from flashcards.notes.models import Note
+
+
+class NoteForm(forms.ModelForm):
+    """ Edits the whole content of the note, which is not a field when the note is large """
+    content = forms.CharField(label='Content', widget=forms.Textarea)
+
+    class Meta:
+        model = Note
+        fields = ('title',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.initial.setdefault('content', self.instance.text)
+        self.order_fields(['title', 'content'])
+
+    def save(self, commit=True):
+        self.instance.text = self.cleaned_data['content']
+        return super().save(commit)
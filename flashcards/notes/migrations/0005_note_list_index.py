@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_auto_20200707_1828'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['created_by', 'updated_at', 'id'], name='notes_note_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_list_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteBody',
+            fields=[
+                ('note', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='notes.note')),
+                ('data', models.BinaryField(verbose_name='zlib compressed content')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='is_large',
+            field=models.BooleanField(default=False, verbose_name='Is the content stored in a NoteBody?'),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='content',
+            field=models.TextField(verbose_name='Content, or its start for large notes'),
+        ),
+    ]
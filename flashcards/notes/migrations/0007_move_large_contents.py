@@ -0,0 +1,52 @@
+import zlib
+
+from django.db import migrations, transaction
+from django.db.models.functions import Length
+
+# Note.INLINE_LENGTH when this migration was written
+INLINE_LENGTH = 4000
+CHUNK_SIZE = 500
+
+
+def move_large_contents(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    NoteBody = apps.get_model('notes', 'NoteBody')
+    large_notes = Note.objects.annotate(length=Length('content')).filter(
+        length__gt=INLINE_LENGTH, is_large=False).order_by('pk').only('pk', 'content')
+    last_pk = 0
+    while notes := list(large_notes.filter(pk__gt=last_pk)[:CHUNK_SIZE]):
+        with transaction.atomic():
+            NoteBody.objects.bulk_create(
+                NoteBody(note_id=note.pk, data=zlib.compress(note.content.encode())) for note in notes)
+            for note in notes:
+                note.content = note.content[:INLINE_LENGTH]
+                note.is_large = True
+            Note.objects.bulk_update(notes, ['content', 'is_large'])
+        last_pk = notes[-1].pk
+
+
+def restore_large_contents(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    NoteBody = apps.get_model('notes', 'NoteBody')
+    bodies = NoteBody.objects.order_by('note')
+    last_pk = 0
+    while chunk := list(bodies.filter(note__gt=last_pk)[:CHUNK_SIZE]):
+        with transaction.atomic():
+            notes = [Note(pk=body.note_id, content=zlib.decompress(body.data).decode(), is_large=False)
+                     for body in chunk]
+            Note.objects.bulk_update(notes, ['content', 'is_large'])
+            NoteBody.objects.filter(pk__in=[body.pk for body in chunk]).delete()
+        last_pk = chunk[-1].note_id
+
+
+class Migration(migrations.Migration):
+    # Every chunk is committed on its own, so tables are not locked for the whole migration
+    atomic = False
+
+    dependencies = [
+        ('notes', '0006_note_body'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_large_contents, restore_large_contents),
+    ]
@@ -1,12 +1,25 @@
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Substr
 from django.urls import reverse
 
 
 class Note(models.Model):
-    """ Note model """
+    """
+    Note model. The content of large notes is stored compressed in a NoteBody, and only its start is kept inline,
+    so listing notes doesn't read it. Search indexes the whole text. Use `text` to get or set the whole content
+    """
+    # Contents with more characters make the note large
+    INLINE_LENGTH = 4000
+
     title = models.CharField('Title', max_length=200)
-    content = models.TextField('Content')
+    content = models.TextField('Content, or its start for large notes')
+    is_large = models.BooleanField('Is the content stored in a NoteBody?', default=False)
     updated_at = models.DateTimeField('Last modified on', auto_now=True)
 
     created_by = models.ForeignKey(
@@ -14,8 +27,98 @@ class Note(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            # Notes of a user, most recently updated first
+            models.Index(fields=['created_by', 'updated_at', 'id'], name='notes_note_user_updated_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def text(self) -> str:
+        """ Whole content of the note. It costs a query for large notes, unless `body` was selected with it """
+        if getattr(self, '_text', None) is not None:
+            return self._text
+        return self.body.text if self.is_large else self.content
+
+    @text.setter
+    def text(self, value: str) -> None:
+        self._text = value
+        self.content = value[:self.INLINE_LENGTH]
+        self.is_large = len(value) > self.INLINE_LENGTH
+
+    def save(self, *args, **kwargs):
+        if getattr(self, '_text', None) is None and 'content' not in self.get_deferred_fields() and \
+                len(self.content) > self.INLINE_LENGTH:
+            # The content was set directly
+            self.text = self.content
+        text = getattr(self, '_text', None)
+        if text is None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.is_large:
+                NoteBody.objects.update_or_create(note=self, defaults={'data': NoteBody.compress(text)})
+            else:
+                NoteBody.objects.filter(note=self).delete()
+
     def get_absolute_url(self):
         return reverse('notes:detail', args=(self.pk,))
+
+    @staticmethod
+    def list_page(user, after: Optional[str] = None, size: int = 50,
+                  excerpt_length: int = 200) -> Tuple[List['Note'], Optional[str]]:
+        """
+        Gets a page of the notes of the user, most recently updated first. The content is not loaded, only an
+        `excerpt` with its first characters
+
+        Args:
+            user: Owner of the notes
+            after: Cursor of the previous page. The first page is returned if not given
+            size: Amount of notes per page
+            excerpt_length: Characters of the excerpt. It has one more if the content is longer, so it can be
+                truncated with an ellipsis
+
+        Returns:
+            tuple: Notes of the page and the cursor of the next page, None if this is the last page
+
+        Raises:
+            ValueError: If the cursor is not valid
+        """
+        qs = Note.objects.filter(created_by=user).defer('content').annotate(
+            excerpt=Substr('content', 1, excerpt_length + 1)).order_by('-updated_at', '-id')
+        if after is not None:
+            updated_at, pk = Note.parse_cursor(after)
+            qs = qs.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=pk))
+        notes = list(qs[:size + 1])
+        if len(notes) > size:
+            return notes[:size], notes[size - 1].cursor()
+        return notes, None
+
+    def cursor(self) -> str:
+        """ Position of the note in the list of notes of its user """
+        return f'{self.updated_at.isoformat()}_{self.pk}'
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> Tuple[datetime, int]:
+        updated_at, _, pk = cursor.rpartition('_')
+        updated_at = datetime.fromisoformat(updated_at)
+        if updated_at.tzinfo is None:
+            raise ValueError('The cursor has no time zone')
+        return updated_at, int(pk)
+
+
+class NoteBody(models.Model):
+    """ Compressed content of a large note, only loaded to show or edit the note """
+    note = models.OneToOneField(Note, on_delete=models.CASCADE, primary_key=True, related_name='body')
+    data = models.BinaryField('zlib compressed content')
+
+    @staticmethod
+    def compress(text: str) -> bytes:
+        return zlib.compress(text.encode())
+
+    @property
+    def text(self) -> str:
+        return zlib.decompress(self.data).decode()
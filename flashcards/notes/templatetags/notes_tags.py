@@ -0,0 +1,13 @@
+from django import template
+
+from flashcards.notes.models import Note
+
+register = template.Library()
+
+
+@register.simple_tag
+def recent_notes(user, count: int = 10):
+    """ Gets the titles of the last updated notes of the user, for the sidebar """
+    if not user.is_authenticated:
+        return Note.objects.none()
+    return Note.objects.filter(created_by=user).only('pk', 'title').order_by('-updated_at', '-id')[:count]
@@ -1,8 +1,14 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
 import pytest
 from django.test import Client, TestCase
 from django.urls import reverse
+from django.utils import timezone
 
-from flashcards.notes.models import Note
+from flashcards.notes.models import Note, NoteBody
+from flashcards.notes.views import NoteListView
 from flashcards.users.models import User
 
 pytestmark = pytest.mark.django_db
@@ -43,3 +49,141 @@ class TestNoteViewsIncludingCreator(TestCase):
         url = self.note.get_absolute_url()
         response = self.client.get(url)
         assert response.status_code == 404
+
+    def test_note_export_view(self):
+        """ Only the notes of the user are exported """
+        self.client.force_login(self.user1)
+        Note.objects.create(title='Not exported', content='...', created_by=self.user2)
+
+        response = self.client.get(reverse('notes:export'))
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        assert [line['title'] for line in lines] == ['Sample title for user1']
+
+
+class TestNoteListView(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('test_username', 'testmail@example.com', 'testing321')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        Note.objects.bulk_create(
+            Note(title=f'Note {i}', content=f'Content of note {i} ' + 'x' * 500, created_by=self.user)
+            for i in range(7)
+        )
+        # Two notes share their update time, the id breaks the tie
+        for i, note in enumerate(Note.objects.order_by('pk')):
+            Note.objects.filter(pk=note.pk).update(updated_at=now - timedelta(minutes=min(i, 5)))
+        self.notes = list(Note.objects.order_by('-updated_at', '-id'))
+
+    def test_list_page(self):
+        pages, after = [], None
+        while True:
+            notes, after = Note.list_page(self.user, after=after, size=3)
+            pages.append([note.pk for note in notes])
+            if after is None:
+                break
+
+        self.assertEqual(pages, [[note.pk for note in self.notes[i:i + 3]] for i in range(0, 7, 3)])
+
+    def test_list_page_does_not_load_the_content(self):
+        notes, _ = Note.list_page(self.user)
+
+        self.assertIn('content', notes[0].get_deferred_fields())
+        self.assertEqual(len(notes[0].excerpt), 201)
+        self.assertTrue(notes[0].excerpt.startswith(f'Content of note {self.notes[0].title[5:]}'))
+
+    def test_list_page_with_invalid_cursor(self):
+        for cursor in ('nope', '2020-07-01T00:00:00_1', '2020-07-01T00:00:00+00:00_x'):
+            with self.assertRaises(ValueError):
+                Note.list_page(self.user, after=cursor)
+
+    @mock.patch.object(NoteListView, 'notes_per_page', 5)
+    def test_note_list_view(self):
+        with self.assertNumQueries(5):
+            # Session, user, version of the notes, page of notes and the sidebar
+            response = self.client.get(reverse('notes:list'))
+        self.assertEqual(list(response.context['object_list']), self.notes[:5])
+
+        response = self.client.get(reverse('notes:list'), {'after': response.context['object_list'].next_after})
+        self.assertEqual(list(response.context['object_list']), self.notes[5:])
+        self.assertIsNone(response.context['object_list'].next_after)
+
+    def test_note_list_view_caches_the_notes_until_they_change(self):
+        self.client.get(reverse('notes:list'))
+
+        with self.assertNumQueries(4):
+            # Session, user, version of the notes and the sidebar
+            cached = self.client.get(reverse('notes:list'))
+        self.notes[0].title = 'Updated title'
+        self.notes[0].save()
+
+        self.assertNotContains(cached, 'Updated title')
+        self.assertContains(self.client.get(reverse('notes:list')), 'Updated title')
+
+    def test_note_list_view_with_invalid_cursor(self):
+        response = self.client.get(reverse('notes:list'), {'after': 'nope'})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_note_list_view_only_lists_notes_of_the_user(self):
+        another_user = User.objects.create_user('test_username2', 'testmail2@example.com', 'testing321')
+        self.client.force_login(another_user)
+
+        response = self.client.get(reverse('notes:list'))
+
+        self.assertEqual(list(response.context['object_list']), [])
+
+
+class TestLargeNotes(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('test_username', 'testmail@example.com', 'testing321')
+        self.client.force_login(self.user)
+        self.text = 'A very long note. ' * 1000
+        self.note = Note.objects.create(title='Large note', content=self.text, created_by=self.user)
+
+    def test_large_content_is_stored_compressed(self):
+        note = Note.objects.get(pk=self.note.pk)
+
+        self.assertTrue(note.is_large)
+        self.assertEqual(len(note.content), Note.INLINE_LENGTH)
+        self.assertLess(len(note.body.data), len(self.text) // 10)
+        self.assertEqual(note.text, self.text)
+
+    def test_shrinking_a_large_note_deletes_its_body(self):
+        self.note.text = 'Short now'
+        self.note.save()
+
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertFalse(note.is_large)
+        self.assertEqual(note.text, 'Short now')
+        self.assertFalse(NoteBody.objects.exists())
+
+    def test_detail_view_loads_the_body_with_the_note(self):
+        with self.assertNumQueries(6):
+            # Session, user, the ETag (the version of the notes and the note), the note with its body and the titles
+            # of the sidebar
+            response = self.client.get(self.note.get_absolute_url())
+
+        self.assertContains(response, self.text.strip()[-100:])
+
+    def test_update_view_edits_the_whole_content(self):
+        url = reverse('notes:update', args=(self.note.pk,))
+
+        self.assertContains(self.client.get(url), self.text.strip()[-100:])
+        self.client.post(url, {'title': 'Large note', 'content': self.text + 'The end'})
+
+        self.assertEqual(Note.objects.get(pk=self.note.pk).text, self.text + 'The end')
+
+    def test_list_does_not_load_bodies(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('notes:list'))
+
+        self.assertContains(response, 'A very long note.')
+
+    def test_export_has_the_whole_content(self):
+        response = self.client.get(reverse('notes:export'))
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        assert [line['content'] for line in lines] == [self.text]
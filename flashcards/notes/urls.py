@@ -7,6 +7,7 @@ app_name = 'notes'
 urlpatterns = [
     path('', views.NoteListView.as_view(), name='list'),
     path('create/', views.NoteCreateView.as_view(), name='create'),
+    path('export.jsonl', views.NoteExportView.as_view(), name='export'),
     path('<int:pk>', views.NoteDetailView.as_view(), name='detail'),
     path('<int:pk>/update', views.NoteUpdateView.as_view(), name='update'),
     path('<int:pk>/delete', views.NoteDeleteView.as_view(), name='delete')
@@ -1,25 +1,67 @@
+from functools import partial
+from typing import Optional
+
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import HttpResponseBadRequest
 from django.urls import reverse_lazy
+from django.views import View
 from django.views.generic import CreateView, ListView, DetailView, UpdateView, DeleteView
 
+from flashcards.conditional import PageVersion, conditional_page
+from flashcards.fragments import LazyPage
+from flashcards.leitner.exporting import streaming_response
+from flashcards.notes.caching import notes_version
+from flashcards.notes.exporting import account_json_lines
+from flashcards.notes.forms import NoteForm
 from flashcards.notes.models import Note
 
 
+def note_page_version(request, pk: int) -> Optional[PageVersion]:
+    updated_at = Note.objects.filter(pk=pk, created_by=request.user).values_list('updated_at', flat=True).first()
+    return None if updated_at is None else ((updated_at.isoformat(),), updated_at)
+
+
 class NoteOwnerOnly:  # Is this kinda like a mixin?
     def get_queryset(self):
         return self.request.user.note_set.all()
 
 
+class NoteWithBody(NoteOwnerOnly):
+    """ Loads the body of large notes in the same query """
+    def get_queryset(self):
+        return super().get_queryset().select_related('body')
+
+
 class NoteListView(LoginRequiredMixin, ListView):
+    """ Lists the notes of the user, paginated by a cursor on the last update """
     template_name = 'notes/list.html'
     model = Note
     login_url = reverse_lazy('users:login')
+    notes_per_page = 50
+
+    def get(self, request, *args, **kwargs):
+        self.after = request.GET.get('after')
+        if self.after is not None:
+            try:
+                Note.parse_cursor(self.after)
+            except ValueError:
+                return HttpResponseBadRequest()
+        # The version is read first, a fragment is never cached under a version newer than the notes it lists
+        self.version = notes_version(request.user.pk)
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # Only loaded when the cached fragment of the page is stale
+        return LazyPage(partial(Note.list_page, self.request.user, after=self.after, size=self.notes_per_page))
+
+    def get_context_data(self, **kwargs):
+        return super().get_context_data(after=self.after, version=self.version, **kwargs)
 
 
 class NoteCreateView(LoginRequiredMixin, CreateView):
     template_name = 'notes/createupdate.html'
     model = Note
-    fields = ['title', 'content']
+    form_class = NoteForm
     login_url = reverse_lazy('users:login')
     extra_context = {'action': 'Create'}
 
@@ -28,15 +70,19 @@ class NoteCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class NoteDetailView(LoginRequiredMixin, NoteOwnerOnly, DetailView):
+class NoteDetailView(LoginRequiredMixin, NoteWithBody, DetailView):
     template_name = 'notes/detail.html'
     model = Note
     login_url = reverse_lazy('users:login')
 
+    @conditional_page(note_page_version)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
-class NoteUpdateView(LoginRequiredMixin, NoteOwnerOnly, UpdateView):
+
+class NoteUpdateView(LoginRequiredMixin, NoteWithBody, UpdateView):
     model = Note
-    fields = ['title', 'content']
+    form_class = NoteForm
     template_name = "notes/createupdate.html"
     login_url = reverse_lazy('users:login')
     extra_context = {'action': 'Update'}
@@ -47,3 +93,11 @@ class NoteDeleteView(LoginRequiredMixin, NoteOwnerOnly, DeleteView):
     success_url = reverse_lazy('notes:list')
     login_url = reverse_lazy('users:login')
     template_name = "notes/delete.html"
+
+
+class NoteExportView(LoginRequiredMixin, View):
+    """ Streams every note of the user as JSON lines """
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, *args, **kwargs):
+        return streaming_response(request, account_json_lines(request.user), 'application/x-ndjson', 'notes.jsonl')
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save
+
+
+class SearchConfig(AppConfig):
+    name = 'flashcards.search'
+
+    def ready(self):
+        from flashcards.notes.models import Note
+        from flashcards.search.backends import index_large_note, repair_search_index
+        post_migrate.connect(repair_search_index, sender=self)
+        post_save.connect(index_large_note, sender=Note)
@@ -0,0 +1,261 @@
+import re
+from typing import List, NamedTuple, Tuple
+
+from django.db import connection as default_connection
+from django.db.models import Model, Q
+
+from flashcards.leitner.models import Card
+from flashcards.notes.models import Note
+
+"""
+Full-text search over the cards and notes of a user. Every database keeps its own index up to date by itself, so
+bulk changes are indexed too:
+
+- PostgreSQL: a tsvector column on the cards and notes tables, with a GIN index. A trigger sets it when the text
+  of the row changes
+- SQLite: an FTS5 table for cards and another for notes, kept in sync with triggers. Their rowid is the id of the
+  card or note, and the owner is indexed as a token so searches never leave the documents of the user
+- Anything else: a plain case insensitive match, without ranking
+
+Large notes only keep the start of their content inline, the rest is compressed in a NoteBody the database can't
+read. The index gets their whole text from `index_large_note`, a post_save receiver, and `index_large_notes`. Bulk
+updates of large notes index only the inline start until the note is saved again or the index rebuilt
+"""
+
+# Searched documents: the title is weighted above the body
+DOCUMENTS = {
+    'card': {'model': Card, 'title': 'front_text', 'body': 'back_text'},
+    'note': {'model': Note, 'title': 'title', 'body': 'content'},
+}
+
+MAX_TERMS = 10
+# Large notes read at a time to index them, with their compressed content
+LARGE_NOTES_CHUNK = 100
+
+
+class SearchResult(NamedTuple):
+    kind: str
+    object: Model
+    rank: float
+
+
+def terms(query: str) -> List[str]:
+    """ Splits the query into words, dropping anything that could be parsed as a search operator """
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+class SearchBackend:
+    """ Plain case insensitive match, used when the database has no full-text index """
+
+    def install(self, cursor) -> None:
+        pass
+
+    def uninstall(self, cursor) -> None:
+        pass
+
+    def repair(self, cursor) -> bool:
+        """ Recreates whatever is missing from the index, returning whether anything was """
+        return False
+
+    def rebuild(self, cursor) -> None:
+        """ Indexes every document from its table, large notes need `index_large_notes` afterwards """
+        pass
+
+    def index_text(self, cursor, kind: str, pk: int, title: str, body: str) -> None:
+        """ Indexes a document from its title and body, instead of the ones in its table """
+        pass
+
+    def index_large_notes(self, cursor) -> None:
+        """ Indexes the whole text of every large note """
+        notes = Note.objects.using(cursor.db.alias).filter(is_large=True).select_related('body').only('title', 'is_large', 'body__data')
+        for note in notes.order_by('pk').iterator(chunk_size=LARGE_NOTES_CHUNK):
+            self.index_text(cursor, 'note', note.pk, note.title, note.text)
+
+    def ranked_ids(self, cursor, kind: str, user_id: int, words: List[str], limit: int) -> List[Tuple[int, float]]:
+        """ Gets the ids of the best matching documents of the user and their rank, higher is better """
+        document = DOCUMENTS[kind]
+        qs = document['model'].objects.all()
+        qs = qs.filter(on_deck__created_by=user_id) if kind == 'card' else qs.filter(created_by=user_id)
+        for word in words:
+            qs = qs.filter(Q(**{f"{document['title']}__icontains": word}) |
+                           Q(**{f"{document['body']}__icontains": word}))
+        return [(pk, 0.0) for pk in qs.order_by('-pk').values_list('pk', flat=True)[:limit]]
+
+
+class PostgresBackend(SearchBackend):
+
+    @staticmethod
+    def vector(title: str, body: str) -> str:
+        return (f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+                f"setweight(to_tsvector('simple', coalesce({body}, '')), 'B')")
+
+    def install(self, cursor) -> None:
+        for kind, document in DOCUMENTS.items():
+            table, title, body = document['model']._meta.db_table, document['title'], document['body']
+            # Not a generated column: it would be computed again on every UPDATE of the row, and index_text
+            # writes the vector of large notes
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector')
+            cursor.execute(f'CREATE OR REPLACE FUNCTION search_{kind}_vector() RETURNS trigger AS $$ '
+                           f'BEGIN NEW.search_vector := {self.vector(f"NEW.{title}", f"NEW.{body}")}; '
+                           f'RETURN NEW; END $$ LANGUAGE plpgsql')
+            cursor.execute(f'DROP TRIGGER IF EXISTS search_{kind}_vector ON {table}')
+            cursor.execute(f'CREATE TRIGGER search_{kind}_vector BEFORE INSERT OR UPDATE OF {title}, {body} '
+                           f'ON {table} FOR EACH ROW EXECUTE FUNCTION search_{kind}_vector()')
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS search_{kind}_vector_idx ON {table} USING gin (search_vector)')
+
+    def uninstall(self, cursor) -> None:
+        for kind, document in DOCUMENTS.items():
+            table = document['model']._meta.db_table
+            cursor.execute(f'DROP TRIGGER IF EXISTS search_{kind}_vector ON {table}')
+            cursor.execute(f'DROP FUNCTION IF EXISTS search_{kind}_vector()')
+            cursor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+
+    def rebuild(self, cursor) -> None:
+        for document in DOCUMENTS.values():
+            cursor.execute(f"UPDATE {document['model']._meta.db_table} "
+                           f"SET search_vector = {self.vector(document['title'], document['body'])}")
+
+    def index_text(self, cursor, kind: str, pk: int, title: str, body: str) -> None:
+        cursor.execute(f"UPDATE {DOCUMENTS[kind]['model']._meta.db_table} SET search_vector = "
+                       f"{self.vector('%s', '%s')} WHERE id = %s", [title, body, pk])
+
+    def ranked_ids(self, cursor, kind: str, user_id: int, words: List[str], limit: int) -> List[Tuple[int, float]]:
+        table = DOCUMENTS[kind]['model']._meta.db_table
+        if kind == 'card':
+            owned = f'{table}.on_deck_id IN (SELECT id FROM leitner_deck WHERE created_by_id = %s)'
+        else:
+            owned = f'{table}.created_by_id = %s'
+        # The last word may be incomplete, it matches as a prefix
+        tsquery = ' & '.join(words[:-1] + [f'{words[-1]}:*'])
+        cursor.execute(
+            f"SELECT {table}.id, ts_rank({table}.search_vector, query) AS rank "
+            f"FROM {table}, to_tsquery('simple', %s) query "
+            f"WHERE {table}.search_vector @@ query AND {owned} ORDER BY rank DESC LIMIT %s",
+            [tsquery, user_id, limit])
+        return cursor.fetchall()
+
+
+class SqliteBackend(SearchBackend):
+
+    @staticmethod
+    def owner_sql(kind: str, row: str) -> str:
+        if kind == 'card':
+            return f"(SELECT 'u' || created_by_id FROM leitner_deck WHERE id = {row}.on_deck_id)"
+        return f"'u' || {row}.created_by_id"
+
+    def triggers(self, kind: str) -> List[str]:
+        document = DOCUMENTS[kind]
+        table, title, body = document['model']._meta.db_table, document['title'], document['body']
+        insert = (f'INSERT INTO search_{kind}_fts (rowid, owner, title, body) '
+                  f'VALUES (NEW.id, {self.owner_sql(kind, "NEW")}, NEW.{title}, NEW.{body});')
+        delete = f'DELETE FROM search_{kind}_fts WHERE rowid = OLD.id;'
+        watched = f'{title}, {body}, on_deck_id' if kind == 'card' else f'{title}, {body}'
+        return [
+            f'CREATE TRIGGER IF NOT EXISTS search_{kind}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+            f'CREATE TRIGGER IF NOT EXISTS search_{kind}_update AFTER UPDATE OF {watched} ON {table} '
+            f'BEGIN {delete} {insert} END',
+            f'CREATE TRIGGER IF NOT EXISTS search_{kind}_delete AFTER DELETE ON {table} BEGIN {delete} END',
+        ]
+
+    def install(self, cursor) -> None:
+        for kind in DOCUMENTS:
+            cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS search_{kind}_fts USING fts5(owner, title, body)')
+            for trigger in self.triggers(kind):
+                cursor.execute(trigger)
+
+    def uninstall(self, cursor) -> None:
+        for kind in DOCUMENTS:
+            for action in ('insert', 'update', 'delete'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS search_{kind}_{action}')
+            cursor.execute(f'DROP TABLE IF EXISTS search_{kind}_fts')
+
+    def repair(self, cursor) -> bool:
+        # Altering the cards or notes tables rebuilds them, which drops their triggers
+        names = [f'search_{kind}_{action}' for kind in DOCUMENTS for action in ('insert', 'update', 'delete')]
+        cursor.execute(f"SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN "
+                       f"({', '.join(['%s'] * len(names))})", names)
+        if cursor.fetchone()[0] == len(names):
+            return False
+        self.install(cursor)
+        self.rebuild(cursor)
+        self.index_large_notes(cursor)
+        return True
+
+    def rebuild(self, cursor) -> None:
+        for kind, document in DOCUMENTS.items():
+            table = document['model']._meta.db_table
+            cursor.execute(f'DELETE FROM search_{kind}_fts')
+            cursor.execute(f'INSERT INTO search_{kind}_fts (rowid, owner, title, body) '
+                           f'SELECT id, {self.owner_sql(kind, table)}, {document["title"]}, {document["body"]} '
+                           f'FROM {table}')
+
+    def index_text(self, cursor, kind: str, pk: int, title: str, body: str) -> None:
+        cursor.execute(f'UPDATE search_{kind}_fts SET title = %s, body = %s WHERE rowid = %s', [title, body, pk])
+
+    def ranked_ids(self, cursor, kind: str, user_id: int, words: List[str], limit: int) -> List[Tuple[int, float]]:
+        phrases = ' '.join(f'"{word}"' for word in words[:-1])
+        match = f'owner : u{user_id} AND {{title body}} : ({phrases} "{words[-1]}"*)'
+        table = f'search_{kind}_fts'
+        cursor.execute(f'SELECT rowid, -bm25({table}, 0.0, 2.0, 1.0) AS rank FROM {table} '
+                       f'WHERE {table} MATCH %s ORDER BY rank DESC LIMIT %s', [match, limit])
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'postgresql': PostgresBackend,
+    'sqlite': SqliteBackend,
+}
+
+
+def backend_for(connection=default_connection) -> SearchBackend:
+    return BACKENDS.get(connection.vendor, SearchBackend)()
+
+
+def repair_search_index(sender, using: str, **kwargs) -> None:
+    """ post_migrate receiver, brings back the parts of the index dropped by the migrations """
+    from django.db import connections
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        backend_for(connection).repair(cursor)
+
+
+def index_large_note(sender, instance: Note, using: str, **kwargs) -> None:
+    """ post_save receiver, indexes the whole text of large notes, their table only has its start """
+    if not instance.is_large:
+        return
+    from django.db import connections
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        backend_for(connection).index_text(cursor, 'note', instance.pk, instance.title, instance.text)
+
+
+def search(user, query: str, limit: int = 50, connection=None) -> List[SearchResult]:
+    """
+    Searches the cards and notes of the user, best matches first
+
+    Args:
+        user: Owner of the cards and notes
+        query: Words to search. The last one may be incomplete
+        limit: Maximum amount of results
+        connection: Database connection, the default one if not given
+
+    Returns:
+        list: Results with the matching card or note. Cards come with their deck
+    """
+    words = terms(query)
+    if not words:
+        return []
+    connection = connection or default_connection
+    backend = backend_for(connection)
+    ranked: List[Tuple[float, str, int]] = []
+    with connection.cursor() as cursor:
+        for kind in DOCUMENTS:
+            ranked.extend((rank, kind, pk) for pk, rank in backend.ranked_ids(cursor, kind, user.pk, words, limit))
+    ranked.sort(key=lambda result: -result[0])
+    ranked = ranked[:limit]
+
+    objects = {
+        'card': Card.objects.select_related('on_deck').in_bulk([pk for _, kind, pk in ranked if kind == 'card']),
+        'note': Note.objects.in_bulk([pk for _, kind, pk in ranked if kind == 'note']),
+    }
+    return [SearchResult(kind, objects[kind][pk], rank) for rank, kind, pk in ranked if pk in objects[kind]]
@@ -0,0 +1,77 @@
+from django.db import migrations
+
+# The SQL of the index when this migration was written, flashcards.search.backends has the current one
+
+CARD_VECTOR = ("setweight(to_tsvector('simple', coalesce(front_text, '')), 'A') || "
+               "setweight(to_tsvector('simple', coalesce(back_text, '')), 'B')")
+NOTE_VECTOR = ("setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+               "setweight(to_tsvector('simple', coalesce(content, '')), 'B')")
+CARD_OWNER = "(SELECT 'u' || created_by_id FROM leitner_deck WHERE id = {row}.on_deck_id)"
+NOTE_OWNER = "'u' || {row}.created_by_id"
+
+
+def sqlite_index(kind: str, table: str, title: str, body: str, owner: str, watched: str):
+    insert = (f'INSERT INTO search_{kind}_fts (rowid, owner, title, body) '
+              f'VALUES (NEW.id, {owner.format(row="NEW")}, NEW.{title}, NEW.{body});')
+    delete = f'DELETE FROM search_{kind}_fts WHERE rowid = OLD.id;'
+    return [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS search_{kind}_fts USING fts5(owner, title, body)',
+        f'CREATE TRIGGER IF NOT EXISTS search_{kind}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS search_{kind}_update AFTER UPDATE OF {watched} ON {table} '
+        f'BEGIN {delete} {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS search_{kind}_delete AFTER DELETE ON {table} BEGIN {delete} END',
+        f'DELETE FROM search_{kind}_fts',
+        f'INSERT INTO search_{kind}_fts (rowid, owner, title, body) '
+        f'SELECT id, {owner.format(row=table)}, {title}, {body} FROM {table}',
+    ]
+
+
+INSTALL = {
+    'postgresql': [
+        f'ALTER TABLE leitner_card ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f'GENERATED ALWAYS AS ({CARD_VECTOR}) STORED',
+        'CREATE INDEX IF NOT EXISTS search_card_vector_idx ON leitner_card USING gin (search_vector)',
+        f'ALTER TABLE notes_note ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f'GENERATED ALWAYS AS ({NOTE_VECTOR}) STORED',
+        'CREATE INDEX IF NOT EXISTS search_note_vector_idx ON notes_note USING gin (search_vector)',
+    ],
+    'sqlite': [
+        *sqlite_index('card', 'leitner_card', 'front_text', 'back_text', CARD_OWNER,
+                      'front_text, back_text, on_deck_id'),
+        *sqlite_index('note', 'notes_note', 'title', 'content', NOTE_OWNER, 'title, content'),
+    ],
+}
+
+UNINSTALL = {
+    'postgresql': [
+        'ALTER TABLE leitner_card DROP COLUMN IF EXISTS search_vector',
+        'ALTER TABLE notes_note DROP COLUMN IF EXISTS search_vector',
+    ],
+    'sqlite': [
+        f'DROP {what} IF EXISTS search_{kind}_{name}'
+        for kind in ('card', 'note')
+        for what, name in (('TRIGGER', 'insert'), ('TRIGGER', 'update'), ('TRIGGER', 'delete'), ('TABLE', 'fts'))
+    ],
+}
+
+
+def install(apps, schema_editor):
+    for sql in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def uninstall(apps, schema_editor):
+    for sql in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leitner', '0008_daily_review_stats'),
+        ('notes', '0004_auto_20200707_1828'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
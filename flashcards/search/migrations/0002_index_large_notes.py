@@ -0,0 +1,76 @@
+import zlib
+
+from django.db import migrations
+
+# The SQL of the index when this migration was written, flashcards.search.backends has the current one
+
+# Large notes read at a time, with their compressed content
+CHUNK_SIZE = 100
+
+
+def vector(title: str, body: str) -> str:
+    return (f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+            f"setweight(to_tsvector('simple', coalesce({body}, '')), 'B')")
+
+
+# The vector of notes is no longer a generated column on PostgreSQL, so the one of large notes can be written
+NOTE_TRIGGER = [
+    'ALTER TABLE notes_note DROP COLUMN IF EXISTS search_vector',
+    'ALTER TABLE notes_note ADD COLUMN search_vector tsvector',
+    f'CREATE OR REPLACE FUNCTION search_note_vector() RETURNS trigger AS $$ '
+    f'BEGIN NEW.search_vector := {vector("NEW.title", "NEW.content")}; RETURN NEW; END $$ LANGUAGE plpgsql',
+    'CREATE TRIGGER search_note_vector BEFORE INSERT OR UPDATE OF title, content ON notes_note '
+    'FOR EACH ROW EXECUTE FUNCTION search_note_vector()',
+    f'UPDATE notes_note SET search_vector = {vector("title", "content")}',
+    'CREATE INDEX search_note_vector_idx ON notes_note USING gin (search_vector)',
+]
+
+NOTE_GENERATED = [
+    'DROP TRIGGER IF EXISTS search_note_vector ON notes_note',
+    'DROP FUNCTION IF EXISTS search_note_vector()',
+    'ALTER TABLE notes_note DROP COLUMN IF EXISTS search_vector',
+    f'ALTER TABLE notes_note ADD COLUMN search_vector tsvector '
+    f'GENERATED ALWAYS AS ({vector("title", "content")}) STORED',
+    'CREATE INDEX search_note_vector_idx ON notes_note USING gin (search_vector)',
+]
+
+INDEX_TEXT = {
+    'postgresql': f"UPDATE notes_note SET search_vector = {vector('%s', '%s')} WHERE id = %s",
+    'sqlite': 'UPDATE search_note_fts SET title = %s, body = %s WHERE rowid = %s',
+}
+
+
+def index_large_notes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in INDEX_TEXT:
+        return
+    if vendor == 'postgresql':
+        for sql in NOTE_TRIGGER:
+            schema_editor.execute(sql)
+    NoteBody = apps.get_model('notes', 'NoteBody')
+    bodies = NoteBody.objects.using(schema_editor.connection.alias).select_related('note').order_by('note')
+    for body in bodies.iterator(chunk_size=CHUNK_SIZE):
+        schema_editor.execute(INDEX_TEXT[vendor], [body.note.title, zlib.decompress(body.data).decode(), body.pk])
+
+
+def unindex_large_notes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in NOTE_GENERATED:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        schema_editor.execute('DELETE FROM search_note_fts')
+        schema_editor.execute("INSERT INTO search_note_fts (rowid, owner, title, body) "
+                              "SELECT id, 'u' || created_by_id, title, content FROM notes_note")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_search_index'),
+        ('notes', '0007_move_large_contents'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_large_notes, unindex_large_notes),
+    ]
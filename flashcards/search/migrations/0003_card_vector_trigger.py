@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# The SQL of the index when this migration was written, flashcards.search.backends has the current one
+
+
+def vector(title: str, body: str) -> str:
+    return (f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+            f"setweight(to_tsvector('simple', coalesce({body}, '')), 'B')")
+
+
+# A generated column is computed again on every UPDATE of the card, answering it included. The trigger only runs
+# when its text changes
+CARD_TRIGGER = [
+    'ALTER TABLE leitner_card DROP COLUMN IF EXISTS search_vector',
+    'ALTER TABLE leitner_card ADD COLUMN search_vector tsvector',
+    f'CREATE OR REPLACE FUNCTION search_card_vector() RETURNS trigger AS $$ '
+    f'BEGIN NEW.search_vector := {vector("NEW.front_text", "NEW.back_text")}; '
+    f'RETURN NEW; END $$ LANGUAGE plpgsql',
+    'CREATE TRIGGER search_card_vector BEFORE INSERT OR UPDATE OF front_text, back_text ON leitner_card '
+    'FOR EACH ROW EXECUTE FUNCTION search_card_vector()',
+    f'UPDATE leitner_card SET search_vector = {vector("front_text", "back_text")}',
+    'CREATE INDEX search_card_vector_idx ON leitner_card USING gin (search_vector)',
+]
+
+CARD_GENERATED = [
+    'DROP TRIGGER IF EXISTS search_card_vector ON leitner_card',
+    'DROP FUNCTION IF EXISTS search_card_vector()',
+    'ALTER TABLE leitner_card DROP COLUMN IF EXISTS search_vector',
+    f'ALTER TABLE leitner_card ADD COLUMN search_vector tsvector '
+    f'GENERATED ALWAYS AS ({vector("front_text", "back_text")}) STORED',
+    'CREATE INDEX search_card_vector_idx ON leitner_card USING gin (search_vector)',
+]
+
+
+def use_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CARD_TRIGGER:
+            schema_editor.execute(sql)
+
+
+def use_generated_column(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CARD_GENERATED:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_index_large_notes'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_trigger, use_generated_column),
+    ]
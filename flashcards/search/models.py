@@ -0,0 +1,2 @@
+# The search index is not made of models, see flashcards.search.backends. This module only makes Django send
+# post_migrate to the app, which repairs the index
@@ -0,0 +1,188 @@
+import pytest
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from flashcards.leitner.models import Card, Deck
+from flashcards.notes.models import Note
+from flashcards.search.backends import backend_for, search, terms
+from flashcards.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+class TestSearch(TestCase):
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        self.client.force_login(self.user)
+        self.deck = Deck.objects.create(description='Spanish', created_by=self.user)
+        self.deck.create_boxes()
+        self.box = self.deck.boxes.get(box_type=0)
+
+    def card(self, front_text: str, back_text: str) -> Card:
+        return Card.objects.create(front_text=front_text, back_text=back_text, on_deck=self.deck, on_box=self.box)
+
+    def test_terms(self):
+        self.assertEqual(terms('  "Hola" OR mundo* -NEAR(x) '), ['hola', 'or', 'mundo', 'near', 'x'])
+        self.assertEqual(terms('¿qué?'), ['qué'])
+
+    def test_search_cards_and_notes(self):
+        card = self.card('Hola', 'Hello')
+        note = Note.objects.create(title='Greetings', content='Hola means hello', created_by=self.user)
+        self.card('Adiós', 'Goodbye')
+
+        results = search(self.user, 'hola')
+
+        self.assertEqual({(result.kind, result.object) for result in results}, {('card', card), ('note', note)})
+
+    def test_search_matches_every_word_and_prefixes_the_last(self):
+        card = self.card('Buenos días', 'Good morning')
+        self.card('Buenas noches', 'Good night')
+
+        self.assertEqual([result.object for result in search(self.user, 'good morn')], [card])
+
+    def test_search_ranks_title_matches_first(self):
+        for i in range(5):
+            self.card(f'Filler {i}', 'Nothing to see')
+        in_body = self.card('Perro', 'A dog, not a gato')
+        in_title = self.card('Gato', 'Cat')
+
+        results = search(self.user, 'gato')
+
+        if connection.vendor in ('sqlite', 'postgresql'):
+            self.assertEqual([result.object for result in results], [in_title, in_body])
+        else:
+            self.assertEqual({result.object for result in results}, {in_title, in_body})
+
+    def test_search_only_returns_documents_of_the_user(self):
+        another_user = User.objects.create_user('anotheruser', 'b@b.com', 'testing321')
+        deck = Deck.objects.create(description='Another deck', created_by=another_user)
+        deck.create_boxes()
+        Card.objects.create(front_text='Hola', back_text='Hello', on_deck=deck, on_box=deck.boxes.first())
+        Note.objects.create(title='Hola', content='Hello', created_by=another_user)
+
+        self.assertEqual(search(self.user, 'hola'), [])
+
+    def test_index_follows_changes(self):
+        card = self.card('Hola', 'Hello')
+        note = Note.objects.create(title='Hola', content='Hello', created_by=self.user)
+
+        card.front_text = 'Chao'
+        card.save()
+        Note.objects.filter(pk=note.pk).update(title='Chao')
+        self.assertEqual(search(self.user, 'hola'), [])
+        self.assertEqual(len(search(self.user, 'chao')), 2)
+
+        card.delete()
+        note.delete()
+        self.assertEqual(search(self.user, 'chao'), [])
+
+    def test_answers_do_not_touch_the_index(self):
+        card = self.card('Hola', 'Hello')
+        Card.objects.filter(pk=card.pk).update(interval=3)
+
+        self.assertEqual([result.object for result in search(self.user, 'hola')], [card])
+
+    def test_repair_rebuilds_a_dropped_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Only SQLite drops the index when a table is altered')
+        card = self.card('Hola', 'Hello')
+        backend = backend_for(connection)
+        with connection.cursor() as cursor:
+            self.assertFalse(backend.repair(cursor))
+            cursor.execute('DROP TRIGGER search_card_insert')
+            cursor.execute('DELETE FROM search_card_fts')
+            self.assertTrue(backend.repair(cursor))
+
+        self.assertEqual([result.object for result in search(self.user, 'hola')], [card])
+
+    def test_search_the_whole_text_of_large_notes(self):
+        note = Note.objects.create(title='Long', content='word ' * Note.INLINE_LENGTH + 'hola', created_by=self.user)
+        self.assertEqual([result.object for result in search(self.user, 'hola')], [note])
+
+        # Saving it again indexes the start of the content first
+        renamed = Note.objects.get(pk=note.pk)
+        renamed.title = 'Renamed'
+        renamed.save()
+        self.assertEqual([result.object for result in search(self.user, 'renamed hola')], [note])
+
+        renamed.text = 'adiós'
+        renamed.save()
+        self.assertEqual(search(self.user, 'hola'), [])
+
+    def test_repair_indexes_the_whole_text_of_large_notes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Only SQLite drops the index when a table is altered')
+        note = Note.objects.create(title='Long', content='word ' * Note.INLINE_LENGTH + 'hola', created_by=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER search_note_insert')
+            cursor.execute('DELETE FROM search_note_fts')
+            self.assertTrue(backend_for(connection).repair(cursor))
+
+        self.assertEqual([result.object for result in search(self.user, 'hola')], [note])
+
+    def test_card_vector_is_only_computed_when_the_text_changes(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Only PostgreSQL keeps the vector on the cards table')
+        card = self.card('Hola', 'Hello')
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT is_generated FROM information_schema.columns "
+                           "WHERE table_name = 'leitner_card' AND column_name = 'search_vector'")
+            self.assertEqual(cursor.fetchone()[0], 'NEVER')
+            # The text is changed behind the trigger, answering the card doesn't index it again
+            cursor.execute('SET session_replication_role = replica')
+            cursor.execute("UPDATE leitner_card SET front_text = 'Adiós' WHERE id = %s", [card.pk])
+            cursor.execute('SET session_replication_role = DEFAULT')
+        Card.objects.filter(pk=card.pk).update(interval=3)
+        self.assertEqual([result.object.pk for result in search(self.user, 'hola')], [card.pk])
+
+        Card.objects.filter(pk=card.pk).update(back_text='Goodbye')
+        self.assertEqual(search(self.user, 'hola'), [])
+        self.assertEqual([result.object.pk for result in search(self.user, 'adiós')], [card.pk])
+
+    def test_search_view(self):
+        self.card('Hola', 'Hello')
+
+        response = self.client.get(reverse('search:search'), {'q': 'hola'})
+
+        self.assertContains(response, 'Card on Spanish')
+
+    def test_search_view_without_matches(self):
+        response = self.client.get(reverse('search:search'), {'q': 'hola'})
+
+        self.assertContains(response, 'Nothing matches')
+
+
+class TestSearchIndexMigrations(TransactionTestCase):
+
+    def test_migrate_restores_the_triggers_of_a_rebuilt_table(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Only SQLite drops the index when a table is altered')
+        user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+
+        with connection.schema_editor() as editor:
+            # How SQLite alters most columns, it can't be done in a transaction
+            editor._remake_table(Note)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+                           [Note._meta.db_table])
+            self.assertEqual(cursor.fetchone()[0], 0)
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        note = Note.objects.create(title='Greetings', content='Hola means hello', created_by=user)
+
+        self.assertEqual([result.object for result in search(user, 'hola')], [note])
+
+    def test_migrations_can_be_reversed_and_applied_again(self):
+        user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        deck = Deck.objects.create(description='Spanish', created_by=user)
+        deck.create_boxes()
+        card = Card.objects.create(front_text='Hola', back_text='Hello', on_deck=deck, on_box=deck.boxes.first())
+        note = Note.objects.create(title='Long', content='word ' * Note.INLINE_LENGTH + 'hola', created_by=user)
+
+        call_command('migrate', 'search', 'zero', verbosity=0)
+        call_command('migrate', 'search', verbosity=0)
+
+        self.assertEqual({result.object for result in search(user, 'hola')}, {card, note})
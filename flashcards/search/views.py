@@ -0,0 +1,18 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import render
+from django.urls import reverse_lazy
+from django.views import View
+
+from flashcards.search.backends import search
+
+
+class SearchView(LoginRequiredMixin, View):
+    """ Searches the cards and notes of the user """
+    template_name = 'search/results.html'
+    login_url = reverse_lazy('users:login')
+    results_per_page = 50
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        results = search(request.user, query, limit=self.results_per_page) if query else []
+        return render(request, self.template_name, {'query': query, 'results': results})
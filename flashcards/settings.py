@@ -1,6 +1,7 @@
 from os import path
 
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 ROOT = environ.Path(__file__).path('../' * 2)
 ENV = environ.Env(DJANGO_DEBUG=(bool, False), )
@@ -23,6 +24,7 @@ INSTALLED_APPS = [
     'flashcards.users.apps.UsersConfig',
     'flashcards.notes.apps.NotesConfig',
     'flashcards.leitner.apps.LeitnerConfig',
+    'flashcards.search.apps.SearchConfig',
     'crispy_forms',
 ]
 
@@ -34,8 +36,9 @@ SITE_ID = 1
 LOGIN_REDIRECT_URL = 'home'
 
 MIDDLEWARE = [
+    'flashcards.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'flashcards.static.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -46,11 +49,12 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'flashcards.urls'
 
+TEMPLATE_LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates, measuring render times for flashcards.timing.ServerTimingMiddleware
+        'BACKEND': 'flashcards.timing.DjangoTemplates',
         'DIRS': [ROOT('templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -59,6 +63,8 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
             ],
             'debug': DEBUG,
+            # Templates are compiled once per process, while developing they are read again to see the changes
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
@@ -66,9 +72,42 @@ TEMPLATES = [
 WSGI_APPLICATION = 'flashcards.wsgi.application'
 
 DATABASES = {'default': ENV.db()}
+# Seconds a connection stays open for the next requests of its thread, 0 closes it at the end of every request.
+# Under async or threaded workers requests don't reuse their thread, use the pool instead
+DATABASES['default']['CONN_MAX_AGE'] = ENV.int('CONN_MAX_AGE', default=0)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = ENV.bool('CONN_HEALTH_CHECKS', default=True)
+# Connections shared by the threads of each worker process, see flashcards.db.postgresql_pool
+if DATABASE_POOL_SIZE := ENV.int('DATABASE_POOL_SIZE', default=0):
+    if not DATABASES['default']['ENGINE'].startswith('django.db.backends.postgresql'):
+        raise ImproperlyConfigured('DATABASE_POOL_SIZE needs a Postgres database')
+    DATABASES['default'].update({
+        'ENGINE': 'flashcards.db.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        'POOL': {'SIZE': DATABASE_POOL_SIZE, 'TIMEOUT': ENV.float('DATABASE_POOL_TIMEOUT', default=10)},
+    })
 if ENV('CI', default=False):
     DATABASES['default']['TEST'] = ENV.db()
 
+# Local memory by default, any other backend can be set with a URL, e.g. CACHE_URL=dbcache://flashcards_cache
+# See https://django-environ.readthedocs.io/en/latest/#supported-types. Local memory is only fine for a single
+# process, gunicorn.conf.py refuses to start several workers with it
+CACHES = {'default': ENV.cache('CACHE_URL', default='locmemcache://')}
+
+# Where sessions are kept: db, cached_db (read from the cache, written through to the database) or signed_cookies
+# (nothing on the server, but they can't be ended before they expire, only logging out clears the cookie)
+SESSION_BACKEND = ENV('SESSION_BACKEND', default='db')
+if SESSION_BACKEND not in ('db', 'cached_db', 'signed_cookies'):
+    raise ImproperlyConfigured(f'Unknown SESSION_BACKEND {SESSION_BACKEND}')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+# Where flash messages are kept until shown: fallback (a cookie, the session if they don't fit), cookie or session
+MESSAGE_STORAGE = {
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+}.get(ENV('MESSAGE_BACKEND', default='fallback'))
+if MESSAGE_STORAGE is None:
+    raise ImproperlyConfigured(f'Unknown MESSAGE_BACKEND {ENV("MESSAGE_BACKEND")}')
+
 AUTH_USER_MODEL = 'users.User'
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,3 +140,22 @@ STATICFILES_DIRS = ['static']
 STATIC_URL = '/static/'
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
+
+# Sends the timings of every request to the client in the Server-Timing header. They tell how the backend works,
+# so they are only sent while developing unless enabled
+SERVER_TIMING_HEADER = ENV.bool('SERVER_TIMING_HEADER', default=DEBUG)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One line per request with its timings, see flashcards.timing
+        'flashcards.timing': {
+            'handlers': ['console'],
+            'level': ENV('REQUEST_TIMING_LOG_LEVEL', default='INFO'),
+        },
+    },
+}
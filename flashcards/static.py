@@ -0,0 +1,33 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+"""
+Static files for both WSGI and ASGI. WhiteNoise only has a sync middleware, which under ASGI would hold a thread
+for the whole of every request, static or not
+"""
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """ WhiteNoise middleware that passes the rest of the requests on without leaving the event loop """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        # Looking up the files only reads the disk with WHITENOISE_AUTOREFRESH, which is for development
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,112 @@
+from django.contrib.messages import constants
+from django.urls import reverse
+from pytest import fixture, mark
+
+from flashcards.leitner.models import Card, Deck
+from flashcards.notes.models import Note
+
+
+@fixture
+def user(client, django_user_model):
+    user = django_user_model.objects.create_user('testuser', 'a@a.com', 'testing321')
+    client.force_login(user)
+    return user
+
+
+@fixture
+def deck(user):
+    deck = Deck.objects.create(description='Test deck', created_by=user)
+    deck.create_boxes()
+    return deck
+
+
+def revalidate(client, url, response):
+    return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+
+def first_get(client, url):
+    """ Gets the page once the CSRF cookie was set, it is part of the ETag of pages with forms """
+    client.get(url)
+    return client.get(url)
+
+
+@mark.django_db()
+def test_note_detail_not_modified(client, user, django_assert_num_queries):
+    note = Note.objects.create(title='Title', content='Content', created_by=user)
+    url = note.get_absolute_url()
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'private' in response['Cache-Control'] and 'no-cache' in response['Cache-Control']
+    assert response['Last-Modified']
+
+    with django_assert_num_queries(4):
+        # Session, user, the version of the notes of the sidebar and the note update time
+        assert revalidate(client, url, response).status_code == 304
+    assert client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code == 304
+
+    note.title = 'New title'
+    note.save()
+    assert revalidate(client, url, response).status_code == 200
+
+
+@mark.django_db()
+def test_sidebar_changes_modify_every_page(client, user):
+    note = Note.objects.create(title='Title', content='Content', created_by=user)
+    url = note.get_absolute_url()
+    response = client.get(url)
+
+    Note.objects.create(title='Another note', content='Content', created_by=user)
+
+    assert revalidate(client, url, response).status_code == 200
+
+
+@mark.django_db()
+def test_deck_detail_not_modified(client, user, deck):
+    url = reverse('leitner:deck-detail', args=(deck.pk,))
+    response = first_get(client, url)
+
+    assert revalidate(client, url, response).status_code == 304
+
+    card = Card.objects.create(front_text='Front', back_text='Back', on_deck=deck, on_box=deck.boxes.first())
+    response = revalidate(client, url, response)
+    assert response.status_code == 200
+    assert revalidate(client, url, response).status_code == 304
+
+    Card.objects.get(pk=card.pk).delete()
+    assert revalidate(client, url, response).status_code == 200
+
+
+@mark.django_db()
+def test_card_update_not_modified(client, user, deck):
+    card = Card.objects.create(front_text='Front', back_text='Back', on_deck=deck, on_box=deck.boxes.first())
+    url = reverse('leitner:card-update', args=(deck.pk, card.pk))
+    response = first_get(client, url)
+
+    assert revalidate(client, url, response).status_code == 304
+
+    card.correct_answer(deck.session.create(current_box=card.on_box, total_cards_on_box=1))
+    assert revalidate(client, url, response).status_code == 200
+
+
+@mark.django_db()
+def test_pages_with_messages_are_not_validated(client, user, deck):
+    url = reverse('leitner:deck-detail', args=(deck.pk,))
+    response = first_get(client, url)
+    client.post(reverse('leitner:deck-list'), {'description': ''})
+
+    response = revalidate(client, url, response)
+
+    assert response.status_code == 200
+    assert not response.has_header('ETag')
+    assert [message.level for message in response.context['messages']] == [constants.WARNING]
+
+
+@mark.django_db()
+def test_pages_of_other_users_are_not_validated(client, user, deck, django_user_model):
+    url = reverse('leitner:deck-detail', args=(deck.pk,))
+    response = first_get(client, url)
+
+    client.force_login(django_user_model.objects.create_user('anotheruser', 'b@b.com', 'testing321'))
+
+    assert revalidate(client, url, response).status_code == 404
@@ -0,0 +1,51 @@
+import pytest
+from django.db import OperationalError, connection
+from pytest import fixture, mark
+
+pytestmark = [mark.django_db, mark.skipif(connection.vendor != 'postgresql', reason='The pool is for Postgres')]
+
+
+@fixture
+def pooled():
+    from flashcards.db.postgresql_pool.base import DatabaseWrapper
+
+    settings_dict = {**connection.settings_dict, 'POOL': {'SIZE': 1, 'TIMEOUT': 0.1}}
+    wrapper = DatabaseWrapper(settings_dict, alias='pool-test')
+    yield wrapper
+    wrapper.close()
+    wrapper.pool.clear()
+
+
+def test_reuses_connections(pooled):
+    pooled.ensure_connection()
+    raw_connection = pooled.connection
+    pooled.close()
+    pooled.ensure_connection()
+
+    assert pooled.connection is raw_connection
+
+
+def test_waits_for_a_free_connection(pooled):
+    from flashcards.db.postgresql_pool.base import DatabaseWrapper
+
+    pooled.ensure_connection()
+    other = DatabaseWrapper(pooled.settings_dict, alias='pool-test')
+
+    with pytest.raises(OperationalError):
+        other.ensure_connection()
+    pooled.close()
+    other.ensure_connection()
+    other.close()
+
+
+def test_rolls_back_open_transactions(pooled):
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+    pooled.ensure_connection()
+    with pooled.connection.cursor() as cursor:
+        cursor.execute('BEGIN')
+        cursor.execute('SELECT 1')
+    pooled.close()
+    pooled.ensure_connection()
+
+    assert pooled.connection.info.transaction_status == TRANSACTION_STATUS_IDLE
@@ -0,0 +1,35 @@
+import logging
+
+from pytest import mark
+
+
+@mark.django_db()
+def test_server_timing_header(client, django_user_model, settings):
+    settings.SERVER_TIMING_HEADER = True
+    user = django_user_model.objects.create_user('testuser', 'a@a.com', 'testing321')
+    client.force_login(user)
+
+    response = client.get('/leitner/')
+    metrics = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+
+    assert set(metrics) == {'db', 'tpl', 'total'}
+    assert 'queries"' in metrics['db']
+    assert metrics['db'] != 'dur=0.0;desc="0 queries"'
+
+
+@mark.django_db()
+def test_server_timing_header_is_not_sent_by_default(client):
+    response = client.get('/admin/login/')
+
+    assert 'Server-Timing' not in response
+
+
+@mark.django_db()
+def test_server_timing_log(client, caplog):
+    with caplog.at_level(logging.INFO, logger='flashcards.timing'):
+        client.get('/admin/login/')
+
+    record, = [record for record in caplog.records if record.name == 'flashcards.timing']
+    assert record.path == '/admin/login/'
+    assert record.status == 200
+    assert record.template_ms > 0
@@ -0,0 +1,13 @@
+from django.template import engines
+
+from flashcards.warmup import TEMPLATES, warm_up
+
+
+def test_warm_up_caches_templates():
+    engine, = engines.all()
+    loader, = engine.engine.template_loaders
+    loader.reset()
+
+    warm_up()
+
+    assert set(TEMPLATES) <= set(loader.get_template_cache)
@@ -0,0 +1,138 @@
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+
+"""
+Per-request timings, logged once per request and sent in the Server-Timing header if SERVER_TIMING_HEADER is set.
+Measures the total time, the amount and time of the ORM queries and the time spent rendering templates
+"""
+
+logger = logging.getLogger('flashcards.timing')
+
+_current_timings: ContextVar[Optional['RequestTimings']] = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.total = 0.0
+        self._rendering = 0
+
+    def server_timing(self) -> str:
+        return (f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+                f'tpl;dur={self.template * 1000:.1f}, total;dur={self.total * 1000:.1f}')
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += perf_counter() - start
+
+
+def _watch_queries() -> None:
+    """
+    Times the queries of the connections of the current thread. The wrapper stays installed and does nothing
+    outside of a request, so it's the same under WSGI and ASGI, where the ORM runs in a thread of the request
+    """
+    for connection in connections.all():
+        if _record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_record_query)
+
+
+class TimedTemplate:
+    """ Wraps a template of the Django backend, adding its render time to the timings of the request """
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, item):
+        return getattr(self._template, item)
+
+    def render(self, context=None, request=None):
+        timings = _current_timings.get()
+        if timings is None:
+            return self._template.render(context, request)
+        # Templates rendered by other templates (e.g. crispy forms) are already counted by the outer one
+        timings._rendering += 1
+        start = perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            timings._rendering -= 1
+            if not timings._rendering:
+                timings.template += perf_counter() - start
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """ Django template backend that measures render times for the Server-Timing header """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class ServerTimingMiddleware:
+    """ Logs the timings of the request, and adds them to the response in the Server-Timing header if enabled """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        start = perf_counter()
+        try:
+            _watch_queries()
+            response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        timings.total = perf_counter() - start
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        start = perf_counter()
+        try:
+            await sync_to_async(_watch_queries)()
+            response = await self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        timings.total = perf_counter() - start
+        return self.finish(request, response, timings)
+
+    @staticmethod
+    def finish(request, response, timings: RequestTimings):
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = timings.server_timing()
+        logger.info(
+            'method=%s path=%s status=%s total_ms=%.1f db_ms=%.1f queries=%d template_ms=%.1f',
+            request.method, request.path, response.status_code, timings.total * 1000, timings.db * 1000,
+            timings.queries, timings.template * 1000,
+            extra={'method': request.method, 'path': request.path, 'status': response.status_code,
+                   'total_ms': timings.total * 1000, 'db_ms': timings.db * 1000, 'queries': timings.queries,
+                   'template_ms': timings.template * 1000},
+        )
+        return response
@@ -10,4 +10,5 @@ urlpatterns = [
     path('account/', include('flashcards.users.urls', namespace='users')),
     path('notes/', include('flashcards.notes.urls', namespace='notes')),
     path('leitner/', include('flashcards.leitner.urls', namespace='leitner')),
+    path('search/', include('flashcards.search.urls', namespace='search')),
 ]
@@ -1,8 +1,13 @@
+import json
+
 import pytest
 from django.test import Client, TestCase, RequestFactory
 from django.urls import reverse
 from pytest_django.asserts import assertContains
 
+from flashcards.leitner.models import Card, Deck
+from flashcards.notes.models import Note
+from flashcards.users.models import User
 from flashcards.users.views import SignupView
 
 pytestmark = pytest.mark.django_db
@@ -39,3 +44,21 @@ class TestSignUpview(TestCase):
         }
         response = self.client.post(self.url, form)
         assert response.status_code == 200
+
+
+class TestAccountExportView(TestCase):
+
+    def test_account_export_view(self):
+        """ The archive has the decks and cards followed by the notes """
+        user = User.objects.create_user('testuser', 'a@a.com', 'testing321')
+        deck = Deck.objects.create(description='Deck', created_by=user)
+        deck.create_boxes()
+        Card.objects.create(front_text='Front', back_text='Back', on_deck=deck, on_box=deck.boxes.get(box_type=0))
+        Note.objects.create(title='Title', content='Content', created_by=user)
+        client = Client()
+        client.force_login(user)
+
+        response = client.get(reverse('users:export'))
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        assert [line['type'] for line in lines] == ['deck', 'card', 'note']
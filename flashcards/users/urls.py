@@ -8,6 +8,7 @@ urlpatterns = [
     path('signup/', views.SignupView.as_view(), name='signup'),
     path('', views.UserDetailsView.as_view(),
          name='userdetails'),
+    path('export.jsonl', views.AccountExportView.as_view(), name='export'),
     path('logout/', auth_views.LogoutView.as_view(template_name='users/logout.html'),
          name='logout'),
     path('login/', auth_views.LoginView.as_view(template_name='users/loginpassword.html',
@@ -1,3 +1,5 @@
+from itertools import chain
+
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import render, redirect
@@ -5,6 +7,8 @@ from django.urls import reverse_lazy
 from django.views import View
 from django.views.generic import TemplateView
 
+from flashcards.leitner import exporting as leitner_exporting
+from flashcards.notes import exporting as notes_exporting
 from .forms import CreateAccountForm
 
 
@@ -29,3 +33,13 @@ class SignupView(View):
 class UserDetailsView(LoginRequiredMixin, TemplateView):
     template_name = 'users/details.html'
     login_url = reverse_lazy('users:login')
+
+
+class AccountExportView(LoginRequiredMixin, View):
+    """ Streams every deck, card and note of the user as JSON lines """
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, *args, **kwargs):
+        lines = chain(leitner_exporting.account_json_lines(request.user),
+                      notes_exporting.account_json_lines(request.user))
+        return leitner_exporting.streaming_response(request, lines, 'application/x-ndjson', 'account.jsonl')
@@ -0,0 +1,25 @@
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+"""
+Work done once per server worker before it takes requests, so the first requests it gets aren't slower than the rest
+"""
+
+# Pages of the study loop and the ones users land on
+TEMPLATES = (
+    'home.html',
+    'leitner/decklistview.html',
+    'leitner/deckdetailview.html',
+    'leitner/studytodayview.html',
+    'leitner/session/start_session.html',
+    'leitner/session/study_session.html',
+    'leitner/session/finished_session.html',
+    'notes/list.html',
+)
+
+
+def warm_up() -> None:
+    """ Builds the lookups of the URL resolver and loads the templates into the cached template loader """
+    get_resolver().reverse_dict
+    for name in TEMPLATES:
+        get_template(name)
@@ -0,0 +1,42 @@
+import multiprocessing
+import os
+
+"""
+Gunicorn settings, read from the environment so they can be tuned per deployment. Measure the study loop with
+scripts/loadtest.py to pick them
+"""
+
+
+def env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+# Set by Heroku from the size of the dyno
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+# Cached data and fragments are invalidated in the cache, a cache of each process would keep stale pages in the rest
+if workers > 1 and os.environ.get('CACHE_URL', 'locmemcache://').startswith('locmemcache:'):
+    raise RuntimeError('Several workers need a cache they share, set CACHE_URL (e.g. dbcache://flashcards_cache)')
+# Threads of each worker, only used by the gthread worker class
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+# Uvicorn workers serve the async views over ASGI, the rest of the worker classes need the WSGI application
+wsgi_app = 'flashcards.asgi:application' if worker_class.startswith('uvicorn') else 'flashcards.wsgi:application'
+
+# Loads the application once in the master, workers fork with it and start faster, sharing its memory
+preload_app = env_bool('GUNICORN_PRELOAD', True)
+# Restarts workers after some requests to bound memory growth, the jitter keeps them from restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+# Seconds an idle keep-alive connection waits for its next request
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+
+def post_fork(server, worker):
+    # Without preload_app the application isn't loaded yet
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'flashcards.settings')
+    import django
+    django.setup()
+    from flashcards.warmup import warm_up
+
+    warm_up()
+    server.log.info('Worker %s warmed up', worker.pid)
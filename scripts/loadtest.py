@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+import argparse
+import http.client
+import re
+import statistics
+import sys
+import threading
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+"""
+Load test of the study loop against a running server, to compare server settings (see gunicorn.conf.py).
+
+Every virtual student logs in, starts a session on its own deck and answers cards until the time is up, starting
+a new session when one finishes. Cards are answered wrong so they stay in the first box and the deck never runs out.
+The decks must belong to the user and have cards in their first box, and shouldn't have a session in progress.
+
+    scripts/loadtest.py --url http://localhost:8000 --username demo --password demo --decks 1 2 3 4 --duration 30
+"""
+
+OPTION = re.compile(r'<option value="(\d+)"')
+
+
+class Student:
+    """ A browser studying a deck, with its own keep-alive connection and cookies """
+
+    def __init__(self, url: str, deck: int):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.netloc, timeout=60)
+        self.deck = deck
+        self.cookies = SimpleCookie()
+        self.timings: List[Tuple[str, float, int]] = []
+
+    def request(self, kind: str, method: str, path: str, data: Optional[dict] = None) -> Tuple[int, str, str]:
+        headers = {'Cookie': '; '.join(f'{name}={morsel.value}' for name, morsel in self.cookies.items()
+                                       if morsel.value)}
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies['csrftoken'].value
+        start = perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server closed the keep-alive connection, e.g. a worker restarting after max_requests
+            self.connection.close()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        content = response.read().decode()
+        self.timings.append((kind, perf_counter() - start, response.status))
+        for cookie in response.headers.get_all('Set-Cookie') or ():
+            self.cookies.load(cookie)
+        return response.status, response.getheader('Location', ''), content
+
+    def log_in(self, username: str, password: str) -> None:
+        self.request('login', 'GET', '/account/login/')
+        status, _, _ = self.request('login', 'POST', '/account/login/', {'username': username, 'password': password})
+        if status != 302:
+            raise RuntimeError('Could not log in, check the username and password')
+
+    def start_session(self) -> None:
+        start_path = f'/leitner/{self.deck}/session'
+        status, location, content = self.request('start', 'GET', start_path)
+        if status == 302 and location.endswith('/finished'):
+            self.request('finish', 'POST', location, {})
+            status, location, content = self.request('start', 'GET', start_path)
+        if status == 200:
+            # The boxes are listed in order, the first one is where the cards are
+            box = OPTION.search(content).group(1)
+            self.request('start', 'POST', start_path, {'current_box': box})
+
+    def study(self, until: float) -> None:
+        cards_path = f'/leitner/{self.deck}/session/cards'
+        self.start_session()
+        while perf_counter() < until:
+            status, location, _ = self.request('card', 'GET', cards_path)
+            if status == 200:
+                self.request('answer', 'POST', cards_path, {'_incorrect': 'No'})
+            elif status == 302:
+                self.start_session()
+            else:
+                raise RuntimeError(f'GET {cards_path} answered {status}')
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def report(timings: List[Tuple[str, float, int]], elapsed: float) -> None:
+    by_kind: Dict[str, List[float]] = defaultdict(list)
+    for kind, latency, _ in timings:
+        by_kind[kind].append(latency)
+    by_kind['total'] = [latency for kind, latency, _ in timings if kind in ('card', 'answer')]
+    errors = sum(status >= 400 for _, _, status in timings)
+    print(f'{"request":>8} {"count":>7} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for kind in ('card', 'answer', 'start', 'finish', 'total'):
+        if latencies := sorted(by_kind.get(kind, ())):
+            print(f'{kind:>8} {len(latencies):>7} {len(latencies) / elapsed:8.1f} '
+                  f'{statistics.median(latencies) * 1000:8.1f} {percentile(latencies, 0.99) * 1000:8.1f}')
+    print(f'Errors: {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of the study loop against a running server')
+    parser.add_argument('--url', default='http://localhost:8000', help='Base URL of the server')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--decks', type=int, nargs='+', required=True,
+                        help='Decks of the user, one virtual student studies each of them')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run the study loop')
+    args = parser.parse_args()
+
+    students = [Student(args.url, deck) for deck in args.decks]
+    for student in students:
+        student.log_in(args.username, args.password)
+        # Only the study loop is measured
+        student.timings.clear()
+    start = perf_counter()
+    threads = [threading.Thread(target=student.study, args=(start + args.duration,)) for student in students]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report([timing for student in students for timing in student.timings], perf_counter() - start)
+
+
+if __name__ == '__main__':
+    sys.exit(main())